@@ -1,3 +1,2 @@
 #!/bin/bash
-python3 ~/scripts/rclonesync.py /home/qapfuc/Documents/Book/ gdrive:Book
-python3 ~/scripts/rclonesync.py /home/qapfuc/Documents/MyDocuments/ gdrive:MyDocuments
+python3 ~/scripts/rclonesync.py --pairs ~/scripts/Sync.pairs
@@ -33,6 +33,32 @@ import inspect                                      # For getting the line numbe
 import collections                                  # For dictionary sorting.
 import hashlib                                      # For checking if the filter file changed and force --first_sync.
 import signal                                       # For keyboard interrupt handler
+import concurrent.futures                           # For running the Path1 and Path2 rclone calls concurrently.
+import heapq                                        # For balancing batch shards.
+from array import array                             # For the compact Listing columns.
+import mmap                                         # For opening Listing snapshots in place.
+import struct
+import json                                         # For the rclone rc API.
+import http.client
+import urllib.parse
+import base64
+import socket
+import secrets
+import threading
+import atexit
+import multiprocessing                              # For the --pairs runner.
+import multiprocessing.connection
+import shlex
+import copy
+import calendar
+import pickle                                       # For the --dir-cache.
+import ctypes                                       # For inotify, for --watch.
+import ctypes.util
+import select
+try:
+    import resource                                 # For the peak memory of the run, for --metrics-file.  Not on Windows.
+except ImportError:
+    resource = None
 
 
 # Configurations and constants
@@ -50,40 +76,25 @@ CHK_FILE = 'RCLONE_TEST'
 RTN_ABORT = 1                                       # Tokens for return codes based on criticality.
 RTN_CRITICAL = 2                                    # Aborts allow rerunning.  Criticals block further runs.  See Readme.md.
 
+FIRST_SYNC_MODIFY_WINDOW = 0.001                    # --first-sync copies Path1 files whose Path2 modtime differs by more.
+                                                    # rclone copy skips those the same within the remote's precision.
+
 
 def bidirSync():
 
-    global path1_lsl_file, path2_lsl_file
+    global path1_lsl_file, path2_lsl_file, journal
+    journal = None
     lsl_file_base  = workdir + "LSL_" + (path1_base + path2_base).replace(':','_').replace(r'/','_').replace('\\','_')
             # eg:  '/home/<user>/.rclonesyncwd/LSL_<path1_base><path2_base>'
     path1_lsl_file = lsl_file_base + '_Path1'
     path2_lsl_file = lsl_file_base + '_Path2'
+    metrics.phase("setup")
 
     
     # ***** Check Sync Only *****
-    def check_sync():           # Used here and at the end of the flow
-        _, path1_contents = load_list(path1_lsl_file)
-        _, path2_contents = load_list(path2_lsl_file)
-
-        sync_integrity_fail = False
-        for key in path1_contents:
-            if key not in path2_contents:
-                logging.info(print_msg("ERROR", "Path1 file not found in Path2", key))
-                sync_integrity_fail = True
-        for key in path2_contents:
-            if key not in path1_contents:
-                logging.info(print_msg("ERROR", "Path2 file not found in Path1", key))
-                sync_integrity_fail = True
-        if sync_integrity_fail:
-            logging.error("ERROR: The content of Path1 and Path2 are out of sync.  --first-sync required to recover.")
-            return 1
-        return 0
-        
-        path1_contents = None
-        path2_contents = None
-
     if args.check_sync_only:
         logging.info(f">>>>> Checking integrity of LSL history files for Path1  <{path1_base}>  versus Path2  <{path2_base}>")
+        metrics.phase("check_sync")
         if check_sync():
             return RTN_CRITICAL
         return 0
@@ -94,7 +105,7 @@ def bidirSync():
     args_string = ''
     for arg in sorted(args.__dict__):
         argvalue = getattr(args, arg)
-        if type(argvalue) is int:
+        if type(argvalue) is int or type(argvalue) is float:
             argvalue = str(argvalue)
         if type(argvalue) is bool:
             if argvalue is False:
@@ -161,45 +172,62 @@ def bidirSync():
 
     # ***** first_sync generate path1 and path2 file lists, and copy any unique path2 files to path1 ***** 
     if first_sync:
-        logging.info(">>>>> --first-sync copying any unique Path2 files to Path1")
+        logging.info(">>>>> --first-sync copying any unique Path2 files to Path1, and synching Path1 to Path2")
+        metrics.phase("list")
+        for lsl_file in (path1_lsl_file, path2_lsl_file):
+            if os.path.exists(lsl_file + '_DIRCACHE'):      # Could be stale versus the first-sync copies
+                os.remove(lsl_file + '_DIRCACHE')
+        if not dry_run and os.path.exists(lsl_file_base + '_JOURNAL'):
+            os.remove(lsl_file_base + '_JOURNAL')
 
         path1_lsl_file_new = path1_lsl_file + '_NEW'
-        status, path1_now = get_and_load_lsl ("current Path1", path1_lsl_file_new, path1_base)
-        if status:  return status
-
         path2_lsl_file_new = path2_lsl_file + '_NEW'
-        status, path2_now = get_and_load_lsl ("current Path2", path2_lsl_file_new, path2_base)
-        if status:  return status
-
+        (status1, path1_now), (status2, path2_now) = concurrently(
+            (get_and_load_lsl, "current Path1", path1_lsl_file_new, path1_base),
+            (get_and_load_lsl, "current Path2", path2_lsl_file_new, path2_base))
+        if status1:  return status1
+        if status2:  return status2
+
+        metrics.phase("plan")
+        # The plan is made from the one listing of each path:  The files only on Path2 are copied to Path1, and the
+        # files on Path1 not the same on Path2 are copied to Path2, as rclone sync Path1 to Path2 would then do.
+        # Each history is its listing, patched with a re-listing of just the files copied to the path.
         files_first_sync_copy_P2P1 = []
         for key in path2_now:
             if key not in path1_now:
                 logging.info(print_msg("Path2", "  --first-sync queue copy to Path1", key))
                 files_first_sync_copy_P2P1.append(key)
 
-        if len(files_first_sync_copy_P2P1) > 0:
-            files_first_sync_copy_P2P1_filename = lsl_file_base + "_files_first_sync_copy_P2P1"
-            with io.open(files_first_sync_copy_P2P1_filename, mode='wt', encoding='utf8') as outf:
-                for item in files_first_sync_copy_P2P1:
-                    outf.write(item + "\n")
-            logging.info(print_msg("Path2", "  Do queued first-sync copies to", "Path1"))
-            if rclone_cmd('copy', path2_base, path1_base, files_file=files_first_sync_copy_P2P1_filename, options=switches):
-                return RTN_CRITICAL
-            if not args.no_cleanup:
-                os.remove(files_first_sync_copy_P2P1_filename)
+        files_first_sync_copy_P1P2 = []
+        for key, size, mtime in path1_now.items():
+            path2_stamp = path2_now.get(key)
+            if path2_stamp is None or path2_stamp[0] != size or abs(path2_stamp[1] - mtime) > FIRST_SYNC_MODIFY_WINDOW:
+                logging.info(print_msg("Path1", "  --first-sync queue copy to Path2", key))
+                files_first_sync_copy_P1P2.append(key)
 
-        
-        logging.info(">>>>> --first-sync synching Path1 to Path2")
-        # NOTE:  --min-size 0 added to block attempting to overwrite Google Doc files which have size -1 on Google Drive.  180729
-        if rclone_cmd('sync', path1_base, path2_base, filter_file=user_filter_file, options=switches + ['--min-size', '0']):
+        metrics.phase("apply")
+        batches = []
+        if len(files_first_sync_copy_P2P1) > 0:
+            batches.append(("Path2", "  Do queued first-sync copies to", "Path1", 'copy', path2_base, path1_base,
+                            files_first_sync_copy_P2P1, path2_now, lsl_file_base + "_files_first_sync_copy_P2P1"))
+        if len(files_first_sync_copy_P1P2) > 0:
+            batches.append(("Path1", "  Do queued first-sync copies to", "Path2", 'copy', path1_base, path2_base,
+                            files_first_sync_copy_P1P2, path1_now, lsl_file_base + "_files_first_sync_copy_P1P2"))
+        if run_batches(batches, switches):
             return RTN_CRITICAL
 
         logging.info(">>>>> --first-sync refreshing lsl files")
-        if rclone_lsl(path1_base, path1_lsl_file, filter_file=user_filter_file):
+        metrics.phase("refresh")
+        (status1, path1_now), (status2, path2_now) = concurrently(
+            (refresh_lsl, path1_base, path1_lsl_file, path1_lsl_file_new, path1_now, (), files_first_sync_copy_P2P1),
+            (refresh_lsl, path2_base, path2_lsl_file, path2_lsl_file_new, path2_now, (), files_first_sync_copy_P1P2))
+        if status1 or status2:
             return RTN_CRITICAL
 
-        if rclone_lsl(path2_base, path2_lsl_file, filter_file=user_filter_file):
-            return RTN_CRITICAL
+        metrics.phase("save")
+        if not dry_run:
+            save_snapshot(path1_now, path1_lsl_file)
+            save_snapshot(path2_now, path2_lsl_file)
 
         if not args.no_cleanup:
             os.remove(path1_lsl_file_new)
@@ -213,20 +241,40 @@ def bidirSync():
         # On prior critical error abort, the prior LSL files are renamed to _ERROR to lock out further runs
         logging.error("***** Cannot find prior Path1 or Path2 lsl files, likely due to critical error on prior run.")
         return RTN_CRITICAL
+    journal = Journal(lsl_file_base + '_JOURNAL')
+
+
+    # ***** Get the current Path1 and Path2 listings, concurrently *****
+    metrics.phase("list")
+    path1_lsl_file_new = path1_lsl_file + '_NEW'
+    path2_lsl_file_new = path2_lsl_file + '_NEW'
+    dir_caches.clear()
+    listed_md5s.clear()
+    if watch_scope is not None:             # A --watch pass:  Only the watch_scope keys are re-listed
+        (status1, path1_now), (status2, path2_now) = concurrently(
+            (scoped_lsl, "Path1", path1_base, path1_lsl_file, path1_lsl_file_new, watch_scope),
+            (scoped_lsl, "Path2", path2_base, path2_lsl_file, path2_lsl_file_new, watch_scope))
+    else:
+        if args.dir_cache:
+            for path_base, lsl_file in ((path1_base, path1_lsl_file), (path2_base, path2_lsl_file)):
+                if path_remote(path_base) is None:
+                    dir_caches[path_base] = DirCache(lsl_file + '_DIRCACHE')
+        (status1, path1_now), (status2, path2_now) = concurrently(
+            (get_and_load_lsl, "current Path1", path1_lsl_file_new, path1_base),
+            (get_and_load_lsl, "current Path2", path2_lsl_file_new, path2_base))
+    if status1:  return status1
+    if status2:  return status2
 
 
     # ***** Check for Path1 deltas relative to the prior sync *****
     logging.info(">>>>> Path1 Checking for Diffs")
-
-    path1_lsl_file_new = path1_lsl_file + '_NEW'
-    status, path1_now = get_and_load_lsl ("current Path1", path1_lsl_file_new, path1_base)
-    if status:  return status
+    metrics.phase("deltas")
 
     def get_check_files (loaded_lsl):
-        check_files = {}
+        check_files = []
         for key in loaded_lsl:
             if args.check_filename in key and "rclonesync/Test/" not in key:
-                check_files[key] = loaded_lsl[key]
+                check_files.append(key)
         return check_files
 
     if check_access:
@@ -236,55 +284,13 @@ def bidirSync():
     if status:  return status
     path1_prior_count = len(path1_prior)    # Save for later max deletes check
 
-    path1_deltas = {}
-    path1_deleted = 0
-    path1_found_same = False
-    for key in path1_prior:
-        _newer=False; _older=False; _size=False; _deleted=False
-        if key not in path1_now:
-            logging.info(print_msg("Path1", "  File was deleted", key))
-            path1_deleted += 1
-            _deleted = True
-        else:
-            if path1_prior[key]['datetime'] != path1_now[key]['datetime']:
-                if path1_prior[key]['datetime'] < path1_now[key]['datetime']:
-                    logging.info(print_msg("Path1", "  File is newer", key))
-                    _newer = True
-                else:               # Current path1 version is older than prior sync.
-                    logging.info(print_msg("Path1", "  File is OLDER", key))
-                    _older = True
-
-        if _newer or _older or _size or _deleted:
-            path1_deltas[key] = {'new':False, 'newer':_newer, 'older':_older, 'size':_size, 'deleted':_deleted}
-        else:
-            path1_found_same = True # Once we've found at least 1 unchanged file we know that not everything has changed, as with a DST time change
-
-    for key in path1_now:
-        if key not in path1_prior:
-            logging.info(print_msg("Path1", "  File is new", key))
-            path1_deltas[key] = {'new':True, 'newer':False, 'older':False, 'size':False, 'deleted':False}
-
-    path1_prior = None              # Free up the memory
-    path1_now = None
-
-    path1_deltas = collections.OrderedDict(sorted(path1_deltas.items()))    # Sort the deltas list.
-    if len(path1_deltas) > 0:
-        news = newers = olders = deletes = 0
-        for key in path1_deltas:
-            if path1_deltas[key]['new']:      news += 1
-            if path1_deltas[key]['newer']:    newers += 1
-            if path1_deltas[key]['older']:    olders += 1
-            if path1_deltas[key]['deleted']:  deletes += 1
-        logging.info(f"  {len(path1_deltas):4} file change(s) on Path1: {news:4} new, {newers:4} newer, {olders:4} older, {deletes:4} deleted")
+    path1_deltas, path1_deleted, path1_found_same = get_deltas("Path1", path1_prior, path1_now)
+    path1_prior = None              # Free up the memory.  path1_now is kept for the final check_sync and snapshot.
 
 
     # ***** Check for Path2 deltas relative to the prior sync *****
     logging.info(">>>>> Path2 Checking for Diffs")
 
-    path2_lsl_file_new = path2_lsl_file + '_NEW'
-    status, path2_now = get_and_load_lsl ("current Path2", path2_lsl_file_new, path2_base)
-    if status:  return status
-
     if check_access:
         path2_check = get_check_files(path2_now)
 
@@ -292,46 +298,8 @@ def bidirSync():
     if status:  return status
     path2_prior_count = len(path2_prior)    # Save for later max deletes check
 
-    path2_deltas = {}
-    path2_deleted = 0
-    path2_found_same = False
-    for key in path2_prior:
-        _newer=False; _older=False; _size=False; _deleted=False
-        if key not in path2_now:
-            logging.info(print_msg("Path2", "  File was deleted", key))
-            path2_deleted += 1
-            _deleted = True
-        else:
-            if path2_prior[key]['datetime'] != path2_now[key]['datetime']:
-                if path2_prior[key]['datetime'] < path2_now[key]['datetime']:
-                    logging.info(print_msg("Path2", "  File is newer", key))
-                    _newer = True
-                else:               # Current Path2 version is older than prior sync.
-                    logging.info(print_msg("Path2", "  File is OLDER", key))
-                    _older = True
-
-        if _newer or _older or _size or _deleted:
-            path2_deltas[key] = {'new':False, 'newer':_newer, 'older':_older, 'size':_size, 'deleted':_deleted}
-        else:
-            path2_found_same = True # Once we've found at least 1 unchanged file we know that not everything has changed, as with a DST time change
-
-    for key in path2_now:
-        if key not in path2_prior:
-            logging.info(print_msg("Path2", "  File is new", key))
-            path2_deltas[key] = {'new':True, 'newer':False, 'older':False, 'size':False, 'deleted':False}
-
-    path2_prior = None              # Free up the memory
-    path2_now = None
-
-    path2_deltas = collections.OrderedDict(sorted(path2_deltas.items()))      # Sort the deltas list.
-    if len(path2_deltas) > 0:
-        news = newers = olders = deletes = 0
-        for key in path2_deltas:
-            if path2_deltas[key]['new']:      news += 1
-            if path2_deltas[key]['newer']:    newers += 1
-            if path2_deltas[key]['older']:    olders += 1
-            if path2_deltas[key]['deleted']:  deletes += 1
-        logging.info(f"  {len(path2_deltas):4} file change(s) on Path2: {news:4} new, {newers:4} newer, {olders:4} older, {deletes:4} deleted")
+    path2_deltas, path2_deleted, path2_found_same = get_deltas("Path2", path2_prior, path2_now)
+    path2_prior = None              # Free up the memory.  path2_now is kept for the final check_sync and snapshot.
 
 
     # ***** Check access health to the Path1 and Path2 filesystems *****
@@ -359,6 +327,26 @@ def bidirSync():
         logging.info(f"  Found <{len(path1_check)}> matching <{args.check_filename}> files on both paths")
 
 
+    # ***** Detect files renamed or moved on one path, to move them on the other path rather than copy and delete *****
+    if args.compare == 'hash':
+        path1_hashes = HashCache(path1_lsl_file + '_HASHES')
+        path2_hashes = HashCache(path2_lsl_file + '_HASHES')
+    moves_P1 = []               # (old key, new key) moved on Path1, as renamed on Path2
+    moves_P2 = []
+    if args.detect_renames:
+        moves_P2 = find_renames(path1_deltas, path2_deltas)
+        moves_P1 = find_renames(path2_deltas, path1_deltas)
+        if args.compare == 'hash':
+            moves_P2, moves_P1 = same_renames(moves_P2, moves_P1, path1_now, path2_now, path1_hashes, path2_hashes)
+        for path_text, deltas, moves in (("Path1", path1_deltas, moves_P2), ("Path2", path2_deltas, moves_P1)):
+            for old, new in moves:
+                logging.info(print_msg(path_text, "  File was renamed", "{}  ->  {}".format(old, new)))
+                del deltas[old]
+                del deltas[new]
+        path1_deleted -= len(moves_P2)
+        path2_deleted -= len(moves_P1)
+
+
     # ***** Check for too many deleted files - possible error condition and don't want to start deleting on the other side !!! *****
     too_many_path1_deletes = False
     if not force and float(path1_deleted)/path1_prior_count > float(max_deletes)/100:
@@ -387,19 +375,25 @@ def bidirSync():
         
 
     # ***** Determine and apply changes to Path1 and Path2 *****
+    metrics.phase("plan")
     files_copy_P1P2 = []
     files_copy_P2P1 = []
     files_delete_P1 = []
     files_delete_P2 = []
+    conflicts = []              # Keys renamed to _Path1 and _Path2 on both paths, and copied to the other path
     already_handled = {}
 
-    if len(path1_deltas) == 0 and len(path2_deltas) == 0:
+    if len(path1_deltas) == 0 and len(path2_deltas) == 0 and len(moves_P1) == 0 and len(moves_P2) == 0:
         logging.info(">>>>> No changes on Path1 or Path2")
     else:
         logging.info(">>>>> Determining and applying changes")
 
+        for path_text, path_base, moves in (("Path1", path1_base, moves_P1), ("Path2", path2_base, moves_P2)):
+            for old, new in moves:
+                logging.info(print_msg(path_text, "  Queue move", "{}  ->  {}".format(path_base + old, path_base + new)))
+
         for key in path1_deltas:
-            if path1_deltas[key]['new'] or path1_deltas[key]['newer'] or path1_deltas[key]['older']:
+            if path1_deltas[key]['new'] or path1_deltas[key]['newer'] or path1_deltas[key]['older'] or path1_deltas[key]['size']:
                 if key not in path2_deltas:
                     logging.info(print_msg("Path1", "  Queue copy to Path2", path2_base + key))
                     files_copy_P1P2.append(key)
@@ -409,26 +403,24 @@ def bidirSync():
                     files_copy_P1P2.append(key)
                     already_handled[key] = 1
 
-                elif path2_deltas[key]['new'] or path2_deltas[key]['newer'] or path2_deltas[key]['older']:
+                elif journal.transferred(key, path1_now, path2_now):
+                    logging.info(print_msg("", "  Done by the interrupted run", key))
+                    already_handled[key] = 1
+
+                elif path2_deltas[key]['new'] or path2_deltas[key]['newer'] or path2_deltas[key]['older'] or path2_deltas[key]['size']:
                     logging.warning(print_msg("WARNING", "  New or changed in both paths", key))
-                    logging.warning(print_msg("Path1", "  Renaming Path1 copy", path1_base + key + "_Path1"))
-                    if rclone_cmd('moveto', path1_base + key, path1_base + key + "_Path1", options=switches):
-                        return RTN_CRITICAL
+                    logging.warning(print_msg("Path1", "  Queue rename of Path1 copy", path1_base + key + "_Path1"))
                     logging.warning(print_msg("Path1", "  Queue copy to Path2", path2_base + key + "_Path1"))
-                    files_copy_P1P2.append(key + "_Path1")
-
-                    logging.warning(print_msg("Path2", "  Renaming Path2 copy", path2_base + key + "_Path2"))
-                    if rclone_cmd('moveto', path2_base + key, path2_base + key + "_Path2", options=switches):
-                        return RTN_CRITICAL
+                    logging.warning(print_msg("Path2", "  Queue rename of Path2 copy", path2_base + key + "_Path2"))
                     logging.warning(print_msg("Path2", "  Queue copy to Path1", path1_base + key + "_Path2"))
-                    files_copy_P2P1.append(key + "_Path2")
+                    conflicts.append(key)
                     already_handled[key] = 1
 
             else: # Path1 deleted
                 if key not in path2_deltas:
                     logging.info(print_msg("Path2", "  Queue delete", path2_base + key))
                     files_delete_P2.append(key)
-                elif path2_deltas[key]['new'] or path2_deltas[key]['newer'] or path2_deltas[key]['older']:
+                elif path2_deltas[key]['new'] or path2_deltas[key]['newer'] or path2_deltas[key]['older'] or path2_deltas[key]['size']:
                     logging.info(print_msg("Path2", "  Queue copy to Path1", path1_base + key))
                     files_copy_P2P1.append(key)
                     already_handled[key] = 1
@@ -437,88 +429,105 @@ def bidirSync():
 
         for key in path2_deltas:
             if key not in already_handled:
-                if path2_deltas[key]['new'] or path2_deltas[key]['newer'] or path2_deltas[key]['older']:
+                if path2_deltas[key]['new'] or path2_deltas[key]['newer'] or path2_deltas[key]['older'] or path2_deltas[key]['size']:
                     logging.info(print_msg("Path2", "  Queue copy to Path1", path1_base + key))
                     files_copy_P2P1.append(key)
                 else: # Deleted 
                     logging.info(print_msg("Path1", "  Queue delete", path1_base + key))
                     files_delete_P1.append(key)
 
-        path1_changes = False
-        path2_changes = False
-        # Do the batch operation
-        if len(files_copy_P2P1) > 0:
-            path1_changes = True
-            files_copy_P2P1_filename = lsl_file_base + "_files_copy_P2P1"
-            with io.open(files_copy_P2P1_filename, mode='wt', encoding='utf8') as outf:
-                for item in files_copy_P2P1:
-                    outf.write(item + "\n")
-            logging.info(print_msg("Path2", "  Do queued copies to", "Path1"))
-            if rclone_cmd('copy', path2_base, path1_base, files_file=files_copy_P2P1_filename, options=switches):
+        # With --compare hash, drop the copies and conflicts of files already the same on both paths, eg only touched
+        if args.compare == 'hash':
+            same = same_content(files_copy_P1P2 + files_copy_P2P1 + conflicts, path1_now, path2_now, path1_hashes, path2_hashes)
+            for key in sorted(same):
+                logging.info(print_msg("", "  Same content, not copied", key))
+            files_copy_P1P2 = [key for key in files_copy_P1P2 if key not in same]
+            files_copy_P2P1 = [key for key in files_copy_P2P1 if key not in same]
+            conflicts = [key for key in conflicts if key not in same]
+        files_copy_P1P2.extend(key + "_Path1" for key in conflicts)
+        files_copy_P2P1.extend(key + "_Path2" for key in conflicts)
+
+        # Check the files about to be overwritten or deleted, where listed from a --dir-cache
+        for path_base, keys in ((path1_base, files_copy_P2P1 + files_delete_P1 + [old for old, _ in moves_P1]),
+                                (path2_base, files_copy_P1P2 + files_delete_P2 + [old for old, _ in moves_P2])):
+            if path_base in dir_caches and dir_caches[path_base].stale(path_base, keys):
+                return RTN_ABORT
+
+        # Journal the planned changes, before applying any
+        metrics.phase("apply")
+        if not dry_run:
+            transfers = {}
+            for to_path, keys, source in ((2, files_copy_P1P2, path1_now), (1, files_copy_P2P1, path2_now)):
+                for key in keys:
+                    if key in source:
+                        transfers[key] = (to_path,) + source.get(key)
+            for key in conflicts:
+                transfers[key + "_Path1"] = (2,) + path1_now.get(key)
+                transfers[key + "_Path2"] = (1,) + path2_now.get(key)
+            for to_path, moves, source in ((1, moves_P1, path2_now), (2, moves_P2, path1_now)):
+                for _, new in moves:
+                    transfers[new] = (to_path,) + source.get(new)
+            journal.plan(transfers, len(files_copy_P1P2) + len(files_copy_P2P1) + len(files_delete_P1) + len(files_delete_P2)
+                         + 2 * len(conflicts) + len(moves_P1) + len(moves_P2))
+
+        # Do the conflict renames, before the copies of the renamed files
+        if len(conflicts) > 0:
+            logging.info(print_msg("", "  Do queued conflict renames", "{} files on each path".format(len(conflicts))))
+            if rename_conflicts(conflicts, switches):
                 return RTN_CRITICAL
-            if not args.no_cleanup:
-                os.remove(files_copy_P2P1_filename)
 
-        if len(files_copy_P1P2) > 0:
-            path2_changes = True
-            files_copy_P1P2_filename = lsl_file_base + "_files_copy_P1P2"
-            with io.open(files_copy_P1P2_filename, mode='wt', encoding='utf8') as outf:
-                for item in files_copy_P1P2:
-                    outf.write(item + "\n")
-            logging.info(print_msg("Path1", "  Do queued copies to", "Path2"))
-            if rclone_cmd('copy', path1_base, path2_base, files_file=files_copy_P1P2_filename, options=switches):
+        # Do the moves of the files renamed on the other path
+        if len(moves_P1) > 0 or len(moves_P2) > 0:
+            logging.info(print_msg("", "  Do queued moves", "{} on Path1, {} on Path2".format(len(moves_P1), len(moves_P2))))
+            if move_files([(path1_base + old, path1_base + new) for old, new in moves_P1] +
+                          [(path2_base + old, path2_base + new) for old, new in moves_P2], switches):
                 return RTN_CRITICAL
-            if not args.no_cleanup:
-                os.remove(files_copy_P1P2_filename)
 
+        # Do the batch operations, concurrently
+        batches = []
+        if len(files_copy_P2P1) > 0:
+            batches.append(("Path2", "  Do queued copies to", "Path1", 'copy', path2_base, path1_base,
+                            files_copy_P2P1, path2_now, lsl_file_base + "_files_copy_P2P1"))
+        if len(files_copy_P1P2) > 0:
+            batches.append(("Path1", "  Do queued copies to", "Path2", 'copy', path1_base, path2_base,
+                            files_copy_P1P2, path1_now, lsl_file_base + "_files_copy_P1P2"))
         if len(files_delete_P1) > 0:
-            path1_changes = True
-            files_delete_P1_filename = lsl_file_base + "_files_delete_P1"
-            with io.open(files_delete_P1_filename, mode='wt', encoding='utf8') as outf:
-                for item in files_delete_P1:
-                    outf.write(item + "\n")
-            logging.info(print_msg("", "  Do queued deletes on", "Path1"))
-            if rclone_cmd('delete', path1_base, files_file=files_delete_P1_filename, options=switches):
-                return RTN_CRITICAL
-            if not args.no_cleanup:
-                os.remove(files_delete_P1_filename)
-
+            batches.append(("", "  Do queued deletes on", "Path1", 'delete', path1_base, None,
+                            files_delete_P1, None, lsl_file_base + "_files_delete_P1"))
         if len(files_delete_P2) > 0:
-            path2_changes = True
-            files_delete_P2_filename = lsl_file_base + "_files_delete_P2"
-            with io.open(files_delete_P2_filename, mode='wt', encoding='utf8') as outf:
-                for item in files_delete_P2:
-                    outf.write(item + "\n")
-            logging.info(print_msg("", "  Do queued deletes on", "Path2"))
-            if rclone_cmd('delete', path2_base, files_file=files_delete_P2_filename, options=switches):
-                return RTN_CRITICAL
-            if not args.no_cleanup:
-                os.remove(files_delete_P2_filename)
+            batches.append(("", "  Do queued deletes on", "Path2", 'delete', path2_base, None,
+                            files_delete_P2, None, lsl_file_base + "_files_delete_P2"))
+        if run_batches(batches, switches):
+            return RTN_CRITICAL
 
-        files_copy_P1P2 = None      # Free up the memory
-        files_copy_P2P1 = None
-        files_delete_P1 = None
-        files_delete_P2 = None
-        already_handled = None
+    # What changed on each path, for patching its history rather than re-listing it
+    path1_removed = set(files_delete_P1 + conflicts + [old for old, _ in moves_P1])
+    path1_listed  = files_copy_P2P1 + [key + "_Path1" for key in conflicts] + [new for _, new in moves_P1]
+    path2_removed = set(files_delete_P2 + conflicts + [old for old, _ in moves_P2])
+    path2_listed  = files_copy_P1P2 + [key + "_Path2" for key in conflicts] + [new for _, new in moves_P2]
+    for path_base, removed, listed in ((path1_base, path1_removed, path1_listed), (path2_base, path2_removed, path2_listed)):
+        if path_base in dir_caches:
+            dir_caches[path_base].forget(removed)
+            dir_caches[path_base].forget(listed)
+
+    files_copy_P1P2 = None      # Free up the memory
+    files_copy_P2P1 = None
+    files_delete_P1 = None
+    files_delete_P2 = None
+    already_handled = None
 
 
     # ***** Clean up and check LSL files integrity *****
     logging.info(">>>>> Refreshing Path1 and Path2 lsl files")
-    if len(path1_deltas) == 0 and len(path2_deltas) == 0:
-        shutil.copy2(path1_lsl_file_new, path1_lsl_file)
-        shutil.copy2(path2_lsl_file_new, path2_lsl_file)
-    else:
-        if path1_changes:
-            if rclone_lsl(path1_base, path1_lsl_file, filter_file=user_filter_file):
-                return RTN_CRITICAL
-        else:
-            shutil.copy2(path1_lsl_file_new, path1_lsl_file)
-
-        if path2_changes:
-            if rclone_lsl(path2_base, path2_lsl_file, filter_file=user_filter_file):
-                return RTN_CRITICAL
-        else:
-            shutil.copy2(path2_lsl_file_new, path2_lsl_file)
+    metrics.phase("refresh")
+    (status1, path1_now), (status2, path2_now) = concurrently(
+        (refresh_lsl, path1_base, path1_lsl_file, path1_lsl_file_new, path1_now, path1_removed, path1_listed),
+        (refresh_lsl, path2_base, path2_lsl_file, path2_lsl_file_new, path2_now, path2_removed, path2_listed))
+    if status1 or status2:
+        return RTN_CRITICAL
+    path1_removed = path1_listed = path2_removed = path2_listed = None
+    if not dry_run:
+        journal.close()
 
     if not args.no_cleanup:
         os.remove(path1_lsl_file_new)
@@ -529,12 +538,26 @@ def bidirSync():
 
     if not args.no_check_sync and not dry_run:
         logging.info(f">>>>> Checking integrity of LSL history files for Path1  <{path1_base}>  versus Path2  <{path2_base}>")
-        if check_sync():
+        metrics.phase("check_sync")
+        if check_sync(path1_now, path2_now):
             return RTN_CRITICAL
 
+    metrics.phase("save")
+    if not dry_run:
+        save_snapshot(path1_now, path1_lsl_file)
+        save_snapshot(path2_now, path2_lsl_file)
+    for dir_cache in dir_caches.values():
+        dir_cache.save()
+    if args.compare == 'hash':
+        path1_hashes.save(path1_now)
+        path2_hashes.save(path2_now)
+    path1_now = None
+    path2_now = None
+
 
     # ***** Optional rmdirs for empty directories *****
     if rmdirs:
+        metrics.phase("rmdirs")
         logging.info(">>>>> rmdirs Path1")
         if rclone_cmd('rmdirs', path1_base, filter_file=user_filter_file, options=switches):
             return RTN_CRITICAL
@@ -551,16 +574,82 @@ def print_msg(tag, msg, key=''):
     return "  {:9}{:35} - {}".format(tag, msg, key)
 
 
+CHECK_SYNC_SHOWN = 20                               # Files logged per path when check_sync fails.  All are logged with -vv.
+def check_sync(path1_contents=None, path2_contents=None):
+    """
+    Check that the Path1 and Path2 lsl histories list the same files.  Used by --check-sync-only and at the end of
+    the sync.  path1_contents and path2_contents are the Listings, else they are loaded from the lsl files' snapshots,
+    or the lsl files.
+    The key columns of the Listings are compared whole, which is all it takes when the paths are in sync.  Else the
+    sorted keys are walked in lockstep by listing_mismatches, and the files not on the other path are reported in
+    bulk, the first CHECK_SYNC_SHOWN of each path.
+    Returns 1 if they are out of sync.
+    """
+    def load(lsl_file):
+        listing = load_snapshot(lsl_file)
+        if listing is None:
+            status, listing = load_list(lsl_file)
+            if status:
+                logging.error(print_msg("ERROR", "Failed loading list file", lsl_file))
+                return None
+        return listing
+
+    if path1_contents is None:
+        path1_contents = load(path1_lsl_file)
+    if path2_contents is None:
+        path2_contents = load(path2_lsl_file)
+    if path1_contents is None or path2_contents is None:
+        return 1
+    if path1_contents.same_keys(path2_contents):
+        return 0
+
+    missing = {"Path1": [], "Path2": []}            # Path:  keys it has but the other path does not
+    for key, path in listing_mismatches(path1_contents, path2_contents):
+        missing[path].append(key)
+    for path, other in (("Path1", "Path2"), ("Path2", "Path1")):
+        keys = missing[path]
+        if not keys:
+            continue
+        logging.error(print_msg("ERROR", f"{path} files not found in {other}", f"{len(keys)} files"))
+        shown = keys if logging.getLogger().isEnabledFor(logging.DEBUG) else keys[:CHECK_SYNC_SHOWN]
+        for key in shown:
+            logging.info(print_msg("ERROR", f"{path} file not found in {other}", key))
+        if len(keys) > len(shown):
+            logging.info(print_msg("", f"  ... and {len(keys) - len(shown)} more", "Run with -vv to list all"))
+    logging.error("ERROR: The content of Path1 and Path2 are out of sync.  --first-sync required to recover.")
+    return 1
+
+
 # ***** rclone call wrapper functions with retries *****
 MAXTRIES=3
-def rclone_lsl(path, ofile, filter_file=None, options=None):
+def rclone_lsl(path, ofile, filter_file=None, options=None, load=None):
     """
-    Fetch an rclone LSL of the path and write it to ofile.
+    Fetch an rclone LSL of the path, write it to ofile, and return (status, Listing) of its content.
+    load(lines, ofile) takes the lsl lines in place of load_lines, returning (status, result), eg to cut them into
+    other files without loading them.
+    The rclone stdout is parsed as it is produced, and written to ofile in the same pass, so the parsing overlaps
+    with the listing rather than following it.
     filter_file is a string full path to a file which will be passed to rclone --filter-from.
-    options is a list of switches passed to rclone (not currently used)
+    options is a list of switches passed to rclone.
+    With --lsjson the listing is by rclone lsjson -R --fast-list, converted to lsl lines as it is read.
     """
     linenum = inspect.getframeinfo(inspect.stack()[1][0]).lineno
-    process_args = [rclone, "lsl", path, "--config", rcconfig]
+    if load is None:
+        load = load_lines
+    if (args.native_local or args.dir_cache) and options is None and args.rclone_args is None and path_remote(path) is None:
+        start = time.time()
+        listed = local_lsl(path, ofile, filter_file)
+        if listed is not None:
+            metrics.call("native lsl", linenum, start, 1, listed[0], len(listed[1]) if listed[1] is not None else None)
+            return listed
+    if rc_url is not None:
+        return rc_lsl(path, ofile, filter_file, options, linenum, load)
+    if args.lsjson:
+        process_args = [rclone, "lsjson", path, "-R", "--files-only", "--fast-list", "--config", rcconfig]
+        if args.compare == 'hash' and path_remote(path) is not None:
+            process_args.extend(["--hash", "--hash-type", "MD5"])
+    else:
+        process_args = [rclone, "lsl", path, "--config", rcconfig]
     if filter_file is not None:
         process_args.extend(["--filter-from", filter_file])
     if options is not None:
@@ -568,13 +657,101 @@ def rclone_lsl(path, ofile, filter_file=None, options=None):
     if args.rclone_args is not None:
         process_args.extend(args.rclone_args)
     logging.debug("    rclone command:  {}".format(process_args))
+    start = time.time()
     for x in range(MAXTRIES):
-        with io.open(ofile, "wt", encoding='utf8') as of:
-            if not subprocess.call(process_args, stdout=of):
-                return 0
-            logging.info(print_msg("WARNING", "rclone lsl try {} failed.".format(x+1)))
-    logging.error(print_msg("ERROR", "rclone lsl failed.  Specified path invalid?  (Line {})".format(linenum)))
-    return 1
+        with io.open(ofile, "wt", encoding='utf8', newline='') as of:    # newline='' writes rclone's lines as-is
+            p = subprocess.Popen(process_args, stdout=subprocess.PIPE, encoding='utf8')
+            md5s = {}
+            read_error = []
+            lines = lsjson_lines(p.stdout, md5s) if args.lsjson else p.stdout
+            status, listing = load(tee_lines(read_lines(lines, read_error), of), ofile)
+            if status or read_error:            # Read rclone to its end, so its return code tells if it failed
+                while p.stdout.buffer.read(JSON_CHUNK):
+                    pass
+            p.stdout.close()
+            p.wait()
+        if p.returncode == 0 and (status or read_error):    # rclone was fine but its output could not be loaded
+            if read_error:
+                logging.error(f"Exception reading the rclone {process_args[1]} output into <{ofile}>:\n  <{read_error[0]}>")
+            metrics.call(process_args[1], linenum, start, x+1, 1)
+            return 1, None
+        if p.returncode == 0:
+            if md5s:
+                listed_md5s.setdefault(path, {}).update(md5s)
+            metrics.call(process_args[1], linenum, start, x+1, 0, len(listing) if listing is not None else None)
+            return 0, listing
+        logging.info(print_msg("WARNING", "rclone {} try {} failed.".format(process_args[1], x+1)))
+    metrics.call(process_args[1], linenum, start, MAXTRIES, 1)
+    logging.error(print_msg("ERROR", "rclone {} failed.  Specified path invalid?  (Line {})".format(process_args[1], linenum)))
+    return 1, None
+
+
+listed_md5s = {}                                    # Path base:  {key: md5} as listed by --lsjson, for --compare hash
+JSON_CHUNK = 64 * 1024
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+def json_items(stream):
+    """
+    Yield each item of the JSON array read from the text stream, such as rclone lsjson output, as soon as it has
+    been read, so the array is never held whole.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    while not buf:
+        chunk = stream.read(JSON_CHUNK)
+        if not chunk:
+            raise ValueError("No JSON array in the rclone lsjson output")
+        buf = chunk.lstrip()
+    if buf[0] != '[':
+        raise ValueError("Expected a JSON array, not <{}>".format(buf[:40]))
+    pos = 1
+    while True:
+        pos = JSON_SEPARATORS.match(buf, pos).end()
+        if pos == len(buf):
+            buf = stream.read(JSON_CHUNK)
+            pos = 0
+            if not buf:
+                raise ValueError("Unterminated JSON array in the rclone lsjson output")
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            item, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:            # The item continues in the next chunk
+            chunk = stream.read(JSON_CHUNK)
+            if not chunk:
+                raise
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        yield item
+
+
+def lsjson_lines(stream, md5s):
+    """Yield rclone lsl lines for the files of the rclone lsjson output read from stream, putting their MD5 hashes
+    into md5s, where listed with --hash."""
+    for item in json_items(stream):
+        line = json_lsl_line(item)
+        if line is not None:
+            md5 = item.get("Hashes", {}).get("md5")
+            if md5:
+                md5s[item["Path"]] = md5
+            yield line
+
+
+def read_lines(lines, errors):
+    """Yield the lines, as read from rclone's output, stopping at an error reading them (such as a cut-off lsjson
+    array from a failed rclone), which is put into errors rather than raised."""
+    try:
+        yield from lines
+    except Exception as e:
+        errors.append(e)
+
+
+def tee_lines(lines, of):
+    """Yield each of the lines after writing it to the of file."""
+    for line in lines:
+        of.write(line)
+        yield line
 
 
 def rclone_cmd(cmd, p1=None, p2=None, filter_file=None, files_file=None, options=None):
@@ -587,6 +764,8 @@ def rclone_cmd(cmd, p1=None, p2=None, filter_file=None, files_file=None, options
         EG: ["--filter-from", "some_file", "--dry-run", "-vv", '--log-format', '""']
     """
     linenum = inspect.getframeinfo(inspect.stack()[1][0]).lineno
+    if rc_url is not None and cmd in RC_METHODS:
+        return rc_cmd(cmd, p1, p2, filter_file, files_file, options, linenum)
     process_args = [rclone, cmd, "--config", rcconfig]
     if p1 is not None:
         process_args.append(p1)
@@ -601,78 +780,1512 @@ def rclone_cmd(cmd, p1=None, p2=None, filter_file=None, files_file=None, options
     if args.rclone_args is not None:
         process_args.extend(args.rclone_args)
     logging.debug("    rclone command:  {}".format(process_args))
+    start = time.time()
     for x in range(MAXTRIES):
         try:
             p = subprocess.Popen(process_args)
             p.wait()
             if p.returncode == 0:
+                metrics.call(cmd, linenum, start, x+1, 0)
                 return 0
         except Exception as e:
             logging.info(print_msg("WARNING", "rclone {} try {} failed.".format(cmd, x+1), p1))
             logging.info("message:  <{}>".format(e))
+    metrics.call(cmd, linenum, start, MAXTRIES, 1)
+    logging.error(print_msg("ERROR", "rclone {} failed.  (Line {})".format(cmd, linenum), p1))
+    return 1
+
+
+# ***** Native lister for local paths, for --native-local and --dir-cache *****
+def local_lsl(path, ofile, filter_file=None):
+    """
+    rclone_lsl of a local path, listed here rather than by an rclone lsl.  The directories are scanned by a pool of
+    args.workers threads, directories excluded by the filters are not descended into, and the regular files are
+    written to ofile as rclone lsl lines and loaded into the returned (status, Listing).
+    As rclone lsl of a local path (without --links or --copy-links):  Symlinks and special files are skipped, keys
+    are '/' separated, and the modtime is the local time to the ns.  The Listing mtimes are those load_lines would
+    load from the lines written.
+    With a dir_caches DirCache for the path, directories with an unchanged mtime are taken from the cache.
+    Returns None, for rclone lsl to list the path, if the filter_file has rules other than excludes, a name is not
+    valid UTF-8, or a directory cannot be read (for rclone to report).
+    """
+    file_match = dir_match = None
+    if filter_file is not None:
+        rules = exclude_rules(filter_file)
+        if rules is None:
+            return None
+        file_match, dir_match = rules
+    dir_cache = dir_caches.get(path)
+    cached = dir_cache.cached if dir_cache is not None else {}
+
+    def scan(rel):
+        """Return rel and its (mtime_ns, files as (name, size, mtime_ns), subdirectory names), and if cached."""
+        mtime_ns = os.stat(path + rel).st_mtime_ns
+        entry = cached.get(rel)
+        if entry is not None and entry[0] == mtime_ns:
+            return rel, entry, True
+        files = []
+        dirs = []
+        with os.scandir(path + rel) as entries:
+            for entry in entries:
+                key = rel + entry.name
+                key.encode('utf8')                  # Raises UnicodeEncodeError for an undecodable name
+                if entry.is_dir(follow_symlinks=False):
+                    if dir_match is None or not dir_match(key + '/'):
+                        dirs.append(entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    if file_match is None or not file_match(key):
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return rel, (mtime_ns, files, dirs), False
+
+    scanned = {}
+    reused = set()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as pool:
+            pending = {pool.submit(scan, '')}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    rel, entry, from_cache = future.result()
+                    scanned[rel] = entry
+                    if from_cache:
+                        reused.add(rel)
+                    pending.update(pool.submit(scan, rel + name + '/') for name in entry[2])
+    except (OSError, UnicodeError) as e:
+        logging.info(print_msg("WARNING", f"Listing with rclone lsl:  {e}", path))
+        return None
+    if dir_cache is not None:
+        dir_cache.scanned(scanned, reused)
+        logging.info(print_msg("", f"  {len(reused)} of {len(scanned)} directories from the dir-cache", path))
+
+    keys = []
+    sizes = array('q')
+    mtimes = array('d')
+    local_minutes = {}                              # epoch // 60: local 'YYYY-MM-DD HH:MM', for whole minute offsets
+    with io.open(ofile, "wt", encoding='utf8', newline='') as of:
+        for rel, (_, files, _) in scanned.items():
+            for name, size, mtime_ns in files:
+                epoch, ns = divmod(mtime_ns, 1000000000)
+                minute = local_minutes.get(epoch // 60)
+                sec = epoch % 60
+                if minute is None:
+                    local = time.localtime(epoch)
+                    minute = time.strftime("%Y-%m-%d %H:%M", local)
+                    if local.tm_sec == sec:
+                        local_minutes[epoch // 60] = minute
+                    else:                           # A local time offset in seconds, as some historic time zones
+                        sec = local.tm_sec
+                frac = "{:09}".format(ns)
+                date_time = LSL_MINUTES.get(minute)
+                if date_time is None:
+                    date_time = lsl_minute(minute)
+                of.write("{:9} {}:{:02}.{} {}{}\n".format(size, minute, sec, frac, rel, name))
+                keys.append(rel + name)
+                sizes.append(size)
+                mtimes.append(date_time + sec + float('.' + frac))
+    return 0, sorted_listing(keys, sizes, mtimes)
+
+
+dir_caches = {}                                     # Local path base: its DirCache, for --dir-cache
+DIR_CACHE_RACY = 2                                  # Directories modified this many seconds before a scan are not cached.
+class DirCache:
+    """
+    The --dir-cache of a local path, kept in the workdir:  Each directory's mtime_ns, files (name, size, mtime_ns)
+    and subdirectory names, as last scanned by local_lsl.  local_lsl reuses the entry of a directory with an
+    unchanged mtime, rather than reading it and stat'ing its files.
+    A directory's mtime changes as entries are added, removed or renamed in it, but not as a file in it is modified
+    in place.  So every args.dir_cache_rescan runs the cache is not used, for a full scan, and bidirSync checks that
+    the files it is about to overwrite or delete are unchanged (stale).  The cache file is removed as it is loaded
+    and is saved only after a successful run, so the run after an abort does a full scan.  The directories changed
+    by the run are dropped (forget), as rclone may write files in place.  Directories modified within
+    DIR_CACHE_RACY seconds of the scan are not cached, as a change in the same timestamp tick would not be seen.
+    """
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.filters_hash = ''
+        if user_filter_file is not None:
+            with io.open(user_filter_file, 'rb') as f:
+                self.filters_hash = hashlib.md5(f.read()).hexdigest()
+        self.cached = {}                            # rel dir, eg '' or 'sub/dir/':  (mtime_ns, files, subdirs)
+        self.runs = 0
+        self.dirs = None                            # As scanned this run
+        self.reused = set()                         # Taken from the cache this run
+        self.scan_ns = time.time_ns()
+        try:
+            with io.open(cache_file, 'rb') as f:
+                runs, filters_hash, cached = pickle.load(f)
+            os.remove(cache_file)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.warning(print_msg("WARNING", f"Ignoring unreadable dir-cache:  {e}", cache_file))
+            return
+        if filters_hash == self.filters_hash and runs < args.dir_cache_rescan:
+            self.cached = cached
+            self.runs = runs
+        else:
+            logging.info(print_msg("", "  Full scan, not using the dir-cache", cache_file))
+
+    def scanned(self, dirs, reused):
+        self.dirs = dirs
+        self.reused = reused
+
+    def stale(self, path_base, keys):
+        """Return True, logging them, if any of the keys listed from the cache have changed since cached."""
+        stale = False
+        for key in keys:
+            rel = key[:key.rfind('/') + 1]
+            if rel not in self.reused:
+                continue
+            name = key[len(rel):]
+            cached = next(((size, mtime_ns) for file, size, mtime_ns in self.dirs[rel][1] if file == name), None)
+            try:
+                stat = os.stat(path_base + key, follow_symlinks=False)
+                current = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                current = None
+            if current != cached:
+                logging.error(print_msg("ERROR", "Changed since its dir-cache entry.  Rerun for a full scan", path_base + key))
+                stale = True
+        return stale
+
+    def forget(self, keys):
+        """Drop the directories of the keys, as changed by this run."""
+        if self.dirs is not None:
+            for key in keys:
+                self.dirs.pop(key[:key.rfind('/') + 1], None)
+
+    def save(self):
+        if self.dirs is None:
+            return
+        racy_ns = self.scan_ns - DIR_CACHE_RACY * 1000000000
+        cached = {rel: entry for rel, entry in self.dirs.items() if entry[0] < racy_ns}
+        runs = self.runs + 1 if self.cached else 1
+        try:
+            with io.open(self.cache_file + '_TMP', 'wb') as f:
+                pickle.dump((runs, self.filters_hash, cached), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(self.cache_file + '_TMP', self.cache_file)
+        except OSError as e:
+            logging.warning(print_msg("WARNING", f"Could not save the dir-cache:  {e}", self.cache_file))
+
+
+# ***** Write-ahead journal, for resuming an interrupted run *****
+JOURNAL_MODIFY_WINDOW = 1.0                         # Seconds a transferred file's mtime may differ, as by backend precision.
+journal = None                                      # The Journal of the run, for the interrupt handler.
+
+class Journal:
+    """
+    Write-ahead journal of the changes applied by a run, kept in the workdir until the run's lsl history files have
+    been written.  The planned file transfers, with the size and mtime of their source, are written before any
+    change is applied, and a line is appended as each operation completes.  So an interrupted or failed run leaves
+    the prior lsl history files valid, plus its journal, rather than requiring --first-sync.
+    On the next run, a file changed on both paths is not a conflict where the journal has it transferred, with its
+    source unchanged since and its destination matching the source.  The unfinished changes are simply found again
+    and applied.  The transfers of an interrupted run are carried into the journal of the next, until one completes.
+    Lines are JSON lists:  ["transfer", to path 1 or 2, key, size, mtime], ["planned", files], ["done", files]
+    """
+    def __init__(self, journal_file):
+        self.journal_file = journal_file
+        self.transfers = {}                         # key:  (to path 1 or 2, source size, source mtime)
+        self.file = None
+        self.planned = False                        # Set once this run's changes are journaled, see resumable
+        self.lock = threading.Lock()
+        if not os.path.exists(journal_file):
+            return
+        planned = done = 0
+        try:
+            with io.open(journal_file, mode='rt', encoding='utf8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry[0] == "transfer":
+                        self.transfers[entry[2]] = (entry[1], entry[3], entry[4])
+                    elif entry[0] == "planned":
+                        planned += entry[1]
+                    elif entry[0] == "done":
+                        done += entry[1]
+        except (ValueError, IndexError):            # A last line cut short by the interruption
+            pass
+        logging.info(print_msg("", "  Resuming an interrupted run", f"{done} of {planned} planned file operations were done"))
+
+    def transferred(self, key, path1_now, path2_now):
+        """Return True if key's transfer in the journal was done, per the current path1_now and path2_now Listings."""
+        if key not in self.transfers:
+            return False
+        to_path, size, mtime = self.transfers[key]
+        source, destination = (path1_now, path2_now) if to_path == 2 else (path2_now, path1_now)
+        now = destination.get(key)
+        return (source.get(key) == (size, mtime) and now is not None and now[0] == size
+                and abs(now[1] - mtime) < JOURNAL_MODIFY_WINDOW)
+
+    def plan(self, transfers, files):
+        """
+        Write the journal before any changes are applied.  transfers is {key: (to path, source size, source mtime)}
+        for the files to be copied or moved to the other path, and files the number of file operations planned.
+        """
+        self.transfers.update(transfers)
+        with io.open(self.journal_file + '_TMP', mode='wt', encoding='utf8') as f:
+            for key, (to_path, size, mtime) in self.transfers.items():
+                f.write(json.dumps(["transfer", to_path, key, size, mtime]) + "\n")
+            f.write(json.dumps(["planned", files]) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.journal_file + '_TMP', self.journal_file)
+        self.file = io.open(self.journal_file, mode='at', encoding='utf8')
+        self.planned = True
+
+    def done(self, files):
+        """Record an operation on the number of files as done."""
+        if self.file is not None:
+            with self.lock:
+                self.file.write(json.dumps(["done", files]) + "\n")
+                self.file.flush()
+
+    def close(self):
+        """Remove the journal, once the run's lsl history files have been written."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+
+# ***** Run metrics, for --metrics-file and --metrics-textfile *****
+class RunMetrics:
+    """
+    Timings and counts of a run, for finding which part of a slow run slowed down.  bidirSync marks the start of
+    each of its phases, and the rclone calls are recorded by command and by the line they were called from, as in
+    the error messages, with their wall time, retries and the entries listed.  The files and bytes transferred are
+    counted by command.  Written as a JSON report by write_json and as a node exporter textfile by write_textfile.
+    """
+    def __init__(self, path1=None, path2=None):
+        self.path1 = path1
+        self.path2 = path2
+        self.start = time.time()
+        self.exit_code = None
+        self.seconds = None
+        self.phases = {}                            # Phase name:  seconds, in the order first started
+        self.current = None                         # (phase name, start time) of the running phase
+        self.calls = {}                             # (cmd, linenum):  [calls, seconds, retries, failures, entries]
+        self.transfers = {}                         # cmd:  [files, bytes]
+        self.lock = threading.Lock()
+
+    def phase(self, name):
+        """Start the name phase of the run, ending the running one."""
+        now = time.time()
+        if self.current is not None:
+            self.phases[self.current[0]] = self.phases.get(self.current[0], 0) + now - self.current[1]
+        self.current = (name, now) if name is not None else None
+
+    def call(self, cmd, linenum, start, tries, status, entries=None):
+        """Record an rclone call of cmd from linenum, started at time start, that took tries to its final status."""
+        seconds = time.time() - start
+        with self.lock:
+            call = self.calls.setdefault((cmd, linenum), [0, 0, 0, 0, 0])
+            call[0] += 1
+            call[1] += seconds
+            call[2] += tries - 1
+            call[3] += 1 if status else 0
+            call[4] += entries or 0
+
+    def transferred(self, cmd, files, bytes=0):
+        """Record the files, and bytes, transferred (or deleted) by a successful cmd."""
+        with self.lock:
+            transfer = self.transfers.setdefault(cmd, [0, 0])
+            transfer[0] += files
+            transfer[1] += bytes
+
+    def finish(self, exit_code):
+        """End the run, with its exit code."""
+        self.phase(None)
+        self.exit_code = exit_code
+        self.seconds = time.time() - self.start
+
+    def peak_rss(self):
+        """Return the peak resident memory of this process and of its largest rclone, as bytes, or Nones."""
+        if resource is None:
+            return None, None
+        scale = 1 if sys.platform == 'darwin' else 1024     # ru_maxrss is kB on Linux, bytes on macOS
+        return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+    def report(self):
+        """Return the run's metrics as a dict, for the JSON report."""
+        peak_rss, rclone_peak_rss = self.peak_rss()
+        return {
+            "path1": self.path1, "path2": self.path2,
+            "start": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.start)),
+            "seconds": round(self.seconds, 3), "exit_code": self.exit_code,
+            "peak_rss_bytes": peak_rss, "rclone_peak_rss_bytes": rclone_peak_rss,
+            "phases": [{"phase": name, "seconds": round(seconds, 3)} for name, seconds in self.phases.items()],
+            "rclone_calls": [{"cmd": cmd, "line": linenum, "calls": calls, "seconds": round(seconds, 3),
+                              "retries": retries, "failures": failures, "entries": entries}
+                             for (cmd, linenum), (calls, seconds, retries, failures, entries) in sorted(self.calls.items())],
+            "transferred": {cmd: {"files": files, "bytes": bytes} for cmd, (files, bytes) in sorted(self.transfers.items())},
+        }
+
+    def write_json(self, json_file):
+        """Write the JSON report to json_file."""
+        with io.open(json_file + '_TMP', mode='wt', encoding='utf8') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
+        os.replace(json_file + '_TMP', json_file)
+
+    def write_textfile(self, prom_file):
+        """
+        Write the metrics to prom_file in the Prometheus text format, for the node exporter textfile collector.
+        The file is written under a temporary name and renamed, as the collector requires.
+        """
+        def label(value):
+            return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+        pair = 'path1="{}",path2="{}"'.format(label(self.path1), label(self.path2))
+        peak_rss, rclone_peak_rss = self.peak_rss()
+        lines = []
+        def gauge(name, help, samples):
+            lines.append("# HELP rclonesync_{} {}".format(name, help))
+            lines.append("# TYPE rclonesync_{} gauge".format(name))
+            for labels, value in samples:
+                lines.append("rclonesync_{}{{{}}} {}".format(name, ",".join([pair] + labels), value))
+
+        gauge("last_run_timestamp_seconds", "Start time of the last run.", [([], round(self.start, 3))])
+        gauge("run_seconds", "Wall time of the last run.", [([], round(self.seconds, 3))])
+        gauge("exit_code", "Exit code of the last run.", [([], self.exit_code)])
+        gauge("phase_seconds", "Wall time of each phase of the last run.",
+              [(['phase="{}"'.format(label(name))], round(seconds, 3)) for name, seconds in self.phases.items()])
+        calls = sorted(self.calls.items())
+        call_labels = ['cmd="{}"', 'line="{}"']
+        for name, help, column in (("rclone_calls", "rclone calls of the last run, by command and calling line.", 0),
+                                   ("rclone_call_seconds", "Wall time of the rclone calls.", 1),
+                                   ("rclone_retries", "Retries of the rclone calls.", 2),
+                                   ("rclone_failures", "rclone calls that failed after all their tries.", 3),
+                                   ("listed_entries", "Files listed by the rclone calls.", 4)):
+            gauge(name, help, [([call_labels[0].format(label(cmd)), call_labels[1].format(linenum)],
+                                round(values[column], 3)) for (cmd, linenum), values in calls])
+        transfers = sorted(self.transfers.items())
+        gauge("files_transferred", "Files copied, moved or deleted by the last run, by command.",
+              [(['cmd="{}"'.format(label(cmd))], files) for cmd, (files, bytes) in transfers])
+        gauge("bytes_transferred", "Bytes of the files copied by the last run, by command.",
+              [(['cmd="{}"'.format(label(cmd))], bytes) for cmd, (files, bytes) in transfers])
+        if peak_rss is not None:
+            gauge("peak_rss_bytes", "Peak resident memory of rclonesync.", [([], peak_rss)])
+            gauge("rclone_peak_rss_bytes", "Peak resident memory of the largest rclone.", [([], rclone_peak_rss)])
+        with io.open(prom_file + '_TMP', mode='wt', encoding='utf8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(prom_file + '_TMP', prom_file)
+
+    def write(self):
+        """
+        Write the --metrics-file and --metrics-textfile, if asked for.  For --pairs each pair writes its own, named
+        with the pair's paths appended, as for the lock file.
+        """
+        for metrics_file, write in ((args.metrics_file, self.write_json), (args.metrics_textfile, self.write_textfile)):
+            if metrics_file is None:
+                continue
+            if args.pairs is not None:
+                base, ext = os.path.splitext(metrics_file)
+                metrics_file = base + '_' + (self.path1 + self.path2).replace(':','_').replace(r'/','_').replace('\\','_') + ext
+            try:
+                write(metrics_file)
+            except Exception as e:
+                logging.warning(print_msg("WARNING", "Cannot write the run metrics", metrics_file))
+                logging.warning("message:  <{}>".format(e))
+
+metrics = RunMetrics()                              # The RunMetrics of the run
+
+
+# ***** Content hashes, for --compare hash *****
+class HashCache:
+    """
+    The MD5 hashes of a path's files, as computed for --compare hash, kept in the workdir as {key: (size, mtime, md5)}.
+    An entry is used only while the key's size and mtime in the current listing are those it was hashed at, so a
+    file is hashed again only once it has changed.  Entries of keys no longer listed as hashed are dropped on save.
+    """
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.cached = {}
+        try:
+            with io.open(cache_file, 'rb') as f:
+                self.cached = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(print_msg("WARNING", f"Ignoring unreadable hash cache:  {e}", cache_file))
+
+    def hashes(self, path_base, listing, keys):
+        """Return {key: md5} for the keys, hashing those not cached at their current size and mtime, nor listed
+        with their hash by --lsjson.  Keys that could not be hashed, such as on a remote without MD5 support, are
+        left out."""
+        hashed = []
+        needed = []
+        listed = listed_md5s.get(path_base, {})
+        for key in keys:
+            if self.cached.get(key, (None, None))[:2] == listing.get(key):
+                hashed.append(key)
+            elif key in listed:
+                self.cached[key] = listing.get(key) + (listed[key],)
+                hashed.append(key)
+            else:
+                needed.append(key)
+        if len(needed) > 0:
+            logging.info(print_msg("", "  Hashing files", "{} on {}".format(len(needed), path_base)))
+            if path_remote(path_base) is None:
+                md5s = local_md5s(path_base, listing, needed)
+            else:
+                md5s = rclone_md5sum(path_base, needed, self.cache_file + '_KEYS')
+            for key, md5 in md5s.items():
+                self.cached[key] = listing.get(key) + (md5,)
+                hashed.append(key)
+        return {key: self.cached[key][2] for key in hashed}
+
+    def save(self, listing):
+        cached = {key: entry for key, entry in self.cached.items() if entry[:2] == listing.get(key)}
+        try:
+            with io.open(self.cache_file + '_TMP', 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(self.cache_file + '_TMP', self.cache_file)
+        except Exception as e:
+            logging.warning(print_msg("WARNING", f"Could not save the hash cache:  {e}", self.cache_file))
+
+
+HASH_CHUNK = 1024 * 1024
+def local_md5s(path_base, listing, keys):
+    """
+    Return {key: md5} for the local files, hashed args.workers at a time.  A file not at its listed size, or changed
+    while being hashed, is left out.
+    """
+    def md5(key):
+        try:
+            with io.open(path_base + key, 'rb') as f:
+                before = os.fstat(f.fileno())
+                if before.st_size != listing.get(key)[0]:
+                    return None
+                digest = hashlib.md5()
+                for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                    digest.update(chunk)
+            after = os.stat(path_base + key)
+        except OSError:
+            return None
+        if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+            return None
+        return digest.hexdigest()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as pool:
+        md5s = pool.map(md5, keys)
+    return {key: md5 for key, md5 in zip(keys, md5s) if md5 is not None}
+
+
+def rclone_md5sum(path, keys, keys_file):
+    """
+    Return {key: md5} for the keys on path, per rclone md5sum.  Keys without an MD5 on the remote are left out.
+    On failure this is only a warning, and {} is returned, so the files are copied as without --compare hash.
+    """
+    with io.open(keys_file, mode='wt', encoding='utf8') as outf:
+        for key in keys:
+            outf.write(key + "\n")
+    process_args = [rclone, "md5sum", path, "--config", rcconfig, "--files-from-raw", keys_file]
+    if args.rclone_args is not None:
+        process_args.extend(args.rclone_args)
+    logging.debug("    rclone command:  {}".format(process_args))
+    linenum = inspect.getframeinfo(inspect.stack()[1][0]).lineno
+    start = time.time()
+    for x in range(MAXTRIES):
+        p = subprocess.run(process_args, stdout=subprocess.PIPE, encoding='utf8')
+        if p.returncode == 0:
+            metrics.call("md5sum", linenum, start, x+1, 0, len(keys))
+            break
+        logging.info(print_msg("WARNING", "rclone md5sum try {} failed.".format(x+1)))
+    else:
+        metrics.call("md5sum", linenum, start, MAXTRIES, 1)
+        logging.warning(print_msg("WARNING", "rclone md5sum failed, copying without comparing hashes", path))
+        return {}
+    if not args.no_cleanup:
+        os.remove(keys_file)
+    md5s = {}
+    for line in p.stdout.splitlines():              # eg "<32 hex digits>  dir/file.txt", or blanks for no MD5
+        md5 = line[:32].strip()
+        if md5:
+            md5s[line[34:]] = md5
+    return md5s
+
+
+def same_content(keys, path1_now, path2_now, path1_hashes, path2_hashes):
+    """
+    For --compare hash, return the set of the keys whose Path1 and Path2 files have the same size and MD5 hash.
+    path1_now and path2_now are the current Listings, and path1_hashes and path2_hashes the HashCaches of the paths.
+    """
+    keys = [key for key in keys if key in path1_now and key in path2_now and path1_now.get(key)[0] == path2_now.get(key)[0]]
+    if len(keys) == 0:
+        return set()
+    hashes1, hashes2 = concurrently(
+        (path1_hashes.hashes, path1_base, path1_now, keys),
+        (path2_hashes.hashes, path2_base, path2_now, keys))
+    return {key for key in keys if key in hashes1 and hashes1[key] == hashes2.get(key)}
+
+
+# ***** rclone rc API backend, for --rc and --rc-addr *****
+RC_MIN_VERSION = 1.59                               # For the rc _config and _filter parameters.
+RC_METHODS = {'copy': 'sync/copy', 'moveto': 'operations/movefile',
+              'delete': 'operations/delete', 'rmdirs': 'operations/rmdirs'}
+rc_url = None                                       # Set when the rclone operations go thru an rclone rcd.
+rc_auth = None                                      # Authorization header value for the rcd, if it requires one.
+rc_process = None                                   # The rcd started for this run, if not attached to one.
+rc_local = threading.local()                        # Each thread keeps its own connection to the rcd.
+
+def rc_start():
+    """
+    Start an rclone rcd for this run, or attach to the one at --rc-addr, and wait until it answers.
+    A started rcd listens on a free localhost port, with a random user/password passed to it by environment, and
+    is quit at exit.  Its global rclone switches (such as --rclone-args) are fixed when it starts.
+    """
+    global rc_url, rc_auth, rc_process
+    if args.rc_addr is not None:
+        rc_url = args.rc_addr if "://" in args.rc_addr else "http://" + args.rc_addr
+        user = os.environ.get("RCLONE_RC_USER")
+        if user is not None:
+            rc_auth = user + ":" + os.environ.get("RCLONE_RC_PASS", "")
+        if args.rclone_args is not None:
+            logging.warning(print_msg("WARNING", "--rclone-args are not passed to an already running rcd"))
+    else:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        rc_url = "http://127.0.0.1:{}".format(port)
+        user, password = "rclonesync", secrets.token_hex(16)
+        rc_auth = user + ":" + password
+        process_args = [rclone, "rcd", "--rc-addr", "127.0.0.1:{}".format(port), "--config", rcconfig]
+        process_args.extend(["-v"] * rc_verbose)
+        if args.no_datetime_log:
+            process_args.extend(['--log-format', '""'])
+        if args.rclone_args is not None:
+            process_args.extend(args.rclone_args)
+        logging.debug("    rclone command:  {}".format(process_args))
+        rc_process = subprocess.Popen(process_args, env=dict(os.environ, RCLONE_RC_USER=user, RCLONE_RC_PASS=password))
+        atexit.register(rc_stop)
+    if rc_auth is not None:
+        rc_auth = "Basic " + base64.b64encode(rc_auth.encode('utf8')).decode('ascii')
+
+    for x in range(100):
+        status, response = rc_call("rc/noop", {})
+        if status == 0:
+            logging.info(f"Using rclone rcd at <{rc_url}>")
+            return 0
+        if rc_process is None or rc_process.poll() is not None:    # Attached to a dead rcd, or ours quit
+            break
+        time.sleep(0.1)
+    logging.error(f"ERROR  rclone rcd at <{rc_url}> not responding.\nError message: {response.get('error')}.")
+    return 1
+
+
+def rc_stop():
+    """Quit the rcd started for this run."""
+    if rc_process is not None and rc_process.poll() is None:
+        rc_call("core/quit", {})
+        try:
+            rc_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            rc_process.kill()
+
+
+def rc_call(method, params):
+    """
+    POST the params to the rc method.  Returns (status, response dict), the dict holding 'error' on failure.
+    The connection is kept open for the thread's next call, saving a connect per operation.
+    """
+    conn = getattr(rc_local, 'conn', None)
+    if conn is None:
+        url = urllib.parse.urlsplit(rc_url)
+        connection = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        conn = rc_local.conn = connection(url.hostname, url.port)
+    headers = {"Content-Type": "application/json"}
+    if rc_auth is not None:
+        headers["Authorization"] = rc_auth
+    try:
+        conn.request("POST", "/" + method, json.dumps(params), headers)
+        resp = conn.getresponse()
+        body = resp.read()
+    except (http.client.HTTPException, OSError) as e:
+        conn.close()
+        rc_local.conn = None
+        return 1, {'error': str(e)}
+    try:
+        response = json.loads(body)
+    except ValueError:
+        response = {'error': body.decode('utf8', 'replace').strip()}
+    if resp.status != 200:
+        return 1, response
+    return 0, response
+
+
+def rc_params(filter_file=None, files_file=None, options=None):
+    """
+    Translate the rclone_cmd/rclone_lsl args to rc _config and _filter parameters.
+    Of the options, only --dry-run, --min-size and --files-from-raw affect the operation.  The logging switches
+    are the rcd's own, as set when it was started.
+    """
+    config = {}
+    filters = {}
+    if filter_file is not None:
+        filters["FilterFrom"] = [filter_file]
+    if files_file is not None:
+        filters["FilesFromRaw"] = [files_file]
+    options = options or []
+    for x, option in enumerate(options):
+        if option == "--dry-run":
+            config["DryRun"] = True
+        elif option == "--min-size":
+            filters["MinSize"] = options[x+1]
+        elif option == "--files-from-raw":
+            filters["FilesFromRaw"] = [options[x+1]]
+    params = {}
+    if config:
+        params["_config"] = config
+    if filters:
+        params["_filter"] = filters
+    return params
+
+
+def rc_split(path):
+    """Split a file path into the rc fs and remote parts, eg 'gdrive:Book/dir/f.txt' -> 'gdrive:Book/dir/', 'f.txt'."""
+    x = max(path.rfind('/'), path.rfind('\\') if is_Windows else -1, path.find(':'))
+    return path[:x+1], path[x+1:]
+
+
+def rc_lsl(path, ofile, filter_file, options, linenum, load):
+    """rclone_lsl thru the rcd operations/list.  The returned items are written to ofile as rclone lsl lines."""
+    params = rc_params(filter_file, options=options)
+    params.update({"fs": path, "remote": "", "opt": {"recurse": True, "filesOnly": True}})
+    logging.debug("    rclone rc:  operations/list {}".format(params))
+    start = time.time()
+    for x in range(MAXTRIES):
+        status, response = rc_call("operations/list", params)
+        if status == 0:
+            with io.open(ofile, "wt", encoding='utf8', newline='') as of:
+                lines = (json_lsl_line(item) for item in response["list"])
+                listed = load(tee_lines(lines, of), ofile)
+            metrics.call("rc operations/list", linenum, start, x+1, listed[0], len(listed[1]) if listed[1] is not None else None)
+            return listed
+        logging.info(print_msg("WARNING", "rclone rc operations/list try {} failed.".format(x+1)))
+        logging.info("message:  <{}>".format(response.get('error')))
+    metrics.call("rc operations/list", linenum, start, MAXTRIES, 1)
+    logging.error(print_msg("ERROR", "rclone lsl failed.  Specified path invalid?  (Line {})".format(linenum)))
+    return 1, None
+
+
+def rc_cmd(cmd, p1, p2, filter_file, files_file, options, linenum):
+    """rclone_cmd thru the rcd method for the cmd in RC_METHODS."""
+    method = RC_METHODS[cmd]
+    params = rc_params(filter_file, files_file, options)
+    if cmd == 'moveto':
+        src_fs, src_remote = rc_split(p1)
+        dst_fs, dst_remote = rc_split(p2)
+        params.update({"srcFs": src_fs, "srcRemote": src_remote, "dstFs": dst_fs, "dstRemote": dst_remote})
+    elif p2 is not None:
+        params.update({"srcFs": p1, "dstFs": p2})
+    else:
+        params["fs"] = p1
+        if cmd == 'rmdirs':
+            params.update({"remote": "", "leaveRoot": False})
+    logging.debug("    rclone rc:  {} {}".format(method, params))
+    start = time.time()
+    for x in range(MAXTRIES):
+        status, response = rc_call(method, params)
+        if status == 0:
+            metrics.call("rc " + method, linenum, start, x+1, 0)
+            return 0
+        logging.info(print_msg("WARNING", "rclone {} try {} failed.".format(cmd, x+1), p1))
+        logging.info("message:  <{}>".format(response.get('error')))
+    metrics.call("rc " + method, linenum, start, MAXTRIES, 1)
     logging.error(print_msg("ERROR", "rclone {} failed.  (Line {})".format(cmd, linenum), p1))
     return 1
 
 
+JSON_MINUTES = {}                                   # Memo of UTC epoch minute:  local 'YYYY-MM-DD HH:MM', for json_lsl_line
+JSON_MODTIME = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$')
+def json_lsl_line(item):
+    """
+    Return the rclone lsl line for an rclone lsjson style item (as from operations/list), or None for a directory.
+    The RFC 3339 ModTime is shown in local time, as rclone lsl does, eg:
+        {"Path": "dir/f.txt", "Size": 541087, "ModTime": "2017-06-19T18:23:28.61Z", ...}
+        -> '   541087 2017-06-19 21:23:28.610000000 dir/f.txt\n'   (local time UTC+3)
+    """
+    if item.get("IsDir"):
+        return None
+    out = JSON_MODTIME.match(item["ModTime"])
+    if not out:
+        raise ValueError("Unexpected ModTime <{}> for <{}>".format(item["ModTime"], item["Path"]))
+    epoch = calendar.timegm([int(x) for x in out.group(1, 2, 3, 4, 5, 6)])
+    zone = out.group(8)
+    if zone != 'Z':
+        offset = int(zone[1:3]) * 3600 + int(zone[4:6]) * 60
+        epoch -= offset if zone[0] == '+' else -offset
+    frac = (out.group(7) or '').ljust(9, '0')[:9]
+    minute = JSON_MINUTES.get(epoch // 60)
+    if minute is None:                      # Zone offsets are whole minutes, so the seconds are the same in local time
+        minute = JSON_MINUTES[epoch // 60] = time.strftime("%Y-%m-%d %H:%M", time.localtime(epoch - epoch % 60))
+    return "{:9} {}:{:02}.{} {}\n".format(item["Size"], minute, epoch % 60, frac, item["Path"])
+
+
+def rename_conflicts(conflicts, options=None):
+    """
+    Rename each of the conflicts keys to key_Path1 on Path1 and to key_Path2 on Path2, running up to args.workers
+    rclone moveto's at a time.  moveto is a server side move where the remote supports it.  The Path1 and Path2
+    renames are interleaved so both paths are kept busy.
+    options is a list of switches passed to rclone.
+    Returns 1 if any of the renames failed.
+    """
+    renames = []
+    for key in conflicts:
+        renames.append((path1_base + key, path1_base + key + "_Path1"))
+        renames.append((path2_base + key, path2_base + key + "_Path2"))
+    return move_files(renames, options)
+
+
+def move_files(moves, options=None):
+    """
+    Do each of the moves, a (source, destination) full path pair, by rclone moveto, running up to args.workers at
+    a time.  options is a list of switches passed to rclone.
+    Returns 1 if any of the moves failed.
+    """
+    def move(move):
+        status = rclone_cmd('moveto', move[0], move[1], options=options)
+        if not status:
+            metrics.transferred('moveto', 1)
+        if not status and journal is not None:
+            journal.done(1)
+        return status
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as pool:
+        statuses = list(pool.map(move, moves))
+    return 1 if any(statuses) else 0
+
+
+def find_renames(deltas, other_deltas):
+    """
+    For --detect-renames, pair the keys deleted from a path with the keys new on it by their size and mtime, which
+    a file renamed or moved on the path keeps.  A (size, mtime) stamp of exactly one deleted and one new key is a
+    match.  Files written together often share a stamp, so within a stamp of several keys, a deleted and a new key
+    of the only file name of the stamp on each side are a match, as for a renamed directory.  A match is used only
+    where the other path has no change of either key, so its copy of the file can be moved into place.  The other
+    files fall back to being copied and deleted.
+    deltas and other_deltas are from get_deltas for the path and the other path.
+    Returns a list of (old key, new key).
+    """
+    deleted = collections.defaultdict(list)
+    new = collections.defaultdict(list)
+    for key, delta in deltas.items():
+        if delta['deleted']:
+            deleted[delta['stamp']].append(key)
+        elif delta['new']:
+            new[delta['stamp']].append(key)
+    def by_name(keys):
+        names = collections.defaultdict(list)
+        for key in keys:
+            names[key[key.rfind('/') + 1:]].append(key)
+        return names
+
+    renames = []
+    for stamp, new_keys in new.items():
+        old_keys = deleted.get(stamp, ())
+        if len(old_keys) == 1 and len(new_keys) == 1:
+            matches = [(old_keys[0], new_keys[0])]
+        elif len(old_keys) > 0:
+            old_names = by_name(old_keys)
+            matches = [(old_names[name][0], keys[0]) for name, keys in by_name(new_keys).items()
+                       if len(keys) == 1 and len(old_names.get(name, ())) == 1]
+        else:
+            continue
+        renames.extend((old, new) for old, new in matches if old not in other_deltas and new not in other_deltas)
+    return renames
+
+
+def same_renames(renames1, renames2, path1_now, path2_now, path1_hashes, path2_hashes):
+    """
+    For --detect-renames with --compare hash, return renames1 and renames2 less the renames whose new file differs
+    from the other path's copy of the old file, by MD5 hash.
+    renames1 and renames2 are lists of (old key, new key) as renamed on Path1 and on Path2.
+    path1_now and path2_now are the current Listings, and path1_hashes and path2_hashes the HashCaches of the paths.
+    """
+    hashes1, hashes2 = concurrently(
+        (path1_hashes.hashes, path1_base, path1_now, [new for _, new in renames1] + [old for old, _ in renames2]),
+        (path2_hashes.hashes, path2_base, path2_now, [new for _, new in renames2] + [old for old, _ in renames1]))
+    return ([(old, new) for old, new in renames1 if new in hashes1 and hashes1[new] == hashes2.get(old)],
+            [(old, new) for old, new in renames2 if new in hashes2 and hashes2[new] == hashes1.get(old)])
+
+
+SHARD_FILE_COST = 256 * 1024                        # Per file overhead, as bytes, when balancing batch shards.
+def run_batches(batches, options=None):
+    """
+    Run the queued batch operations concurrently, with at most args.workers rclone processes at a time.
+    The batches are independent:  The copies to a path and the deletes on that path never share a file.
+    batches is a list of (tag, msg, key, cmd, p1, p2, files, listing, files_filename):
+        tag, msg, key   print_msg args logged as the batch is started, eg "Path2", "  Do queued copies to", "Path1"
+        cmd, p1, p2     passed to rclone_cmd, eg 'copy', path2_base, path1_base
+        files           list of file keys for the batch
+        listing         Listing of p1, for balancing shards by file size, or None to balance by file count
+        files_filename  full path for the --files-from-raw file.  Shards get _1, _2, ... appended.
+    A batch of more than args.shard_files files is split into shards, each run by its own rclone.
+    options is a list of switches passed to rclone.
+    Returns 0 if all batches succeeded, else 1.
+    """
+    jobs = []
+    for tag, msg, key, cmd, p1, p2, files, listing, files_filename in batches:
+        shards = shard_files(files, -(-len(files) // args.shard_files), listing)
+        for x, shard in enumerate(shards):
+            shard_filename = files_filename if len(shards) == 1 else files_filename + "_{}".format(x+1)
+            with io.open(shard_filename, mode='wt', encoding='utf8') as outf:
+                for item in shard:
+                    outf.write(item + "\n")
+            shard_bytes = 0 if listing is None else sum(listing.get(item)[0] for item in shard if item in listing)
+            if len(shards) == 1:
+                jobs.append(((tag, msg, key), cmd, p1, p2, shard_filename, len(shard), shard_bytes))
+            else:
+                jobs.append(((tag, msg + " (shard {} of {}, {} files)".format(x+1, len(shards), len(shard)), key),
+                             cmd, p1, p2, shard_filename, len(shard), shard_bytes))
+
+    def run_job(job):
+        message, cmd, p1, p2, shard_filename, files, bytes = job
+        logging.info(print_msg(*message))
+        status = rclone_cmd(cmd, p1, p2, files_file=shard_filename, options=options)
+        if not status:
+            metrics.transferred(cmd, files, bytes)
+        if not status and journal is not None:
+            journal.done(files)
+        if not status and not args.no_cleanup:
+            os.remove(shard_filename)
+        return status
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as pool:
+        statuses = list(pool.map(run_job, jobs))
+    return 1 if any(statuses) else 0
+
+
+def shard_files(files, shards, listing=None):
+    """
+    Split the files into the number of shards of about equal total size, plus SHARD_FILE_COST per file.
+    Files not found in the listing, or all files if listing is None, count only SHARD_FILE_COST.
+    The files are assigned largest first to the shard with the least total so far.  Each shard is returned sorted.
+    """
+    if shards <= 1:
+        return [files]
+    weighted = []
+    for key in files:
+        found = listing.get(key) if listing is not None else None
+        weighted.append(((found[0] if found is not None else 0) + SHARD_FILE_COST, key))
+    weighted.sort(reverse=True)
+    totals = [(0, x) for x in range(shards)]
+    out = [[] for _ in range(shards)]
+    for weight, key in weighted:
+        total, x = heapq.heappop(totals)
+        out[x].append(key)
+        heapq.heappush(totals, (total + weight, x))
+    return [sorted(shard) for shard in out]
+
+
 LINE_FORMAT = re.compile(r'\s*([0-9]+) ([\d\-]+) ([\d:]+).([\d]+) (.*)')
+LSL_MINUTES = {}                                    # Memoized epoch of each 'YYYY-MM-DD HH:MM' seen, shared across load_list calls.
+LSL_SECONDS = {"{:02}".format(x): x for x in range(60)}
 def load_list(lslfile):
     """
-    Load the content of the lslfile into a dictionary.
+    Load the content of the lslfile into a Listing.  See load_lines.
+    """
+    try:
+        with io.open(lslfile, mode='rt', encoding='utf8') as f:
+            return load_lines(f, lslfile)
+    except Exception as e:
+        logging.error(f"Exception in load_list loading <{lslfile}>:\n  <{e}>")
+        return 1, ""                                                # return False
+
+
+def load_lines(lines, lslfile):
+    """
+    Load lines of rclone lsl output into a Listing.  lslfile names the source in messages.
     The key is the path to the file relative to the Path1/Path2 base.
     File size of -1, as for Google Docs files, prints a warning and are not loaded.
     lsl file format example:
           size <----- datetime (epoch) ----> key
        3009805 2013-09-16 04:13:50.000000000 12 - Wait.mp3
         541087 2017-06-19 21:23:28.610000000 DSC02478.JPG
-    Returned sorted dictionary structure:
-        OrderedDict([('RCLONE_TEST', {'size': '110', 'datetime': 946710000.0}),
-                     ('file1.txt', {'size': '0', 'datetime': 946710000.0}), ...
+    Returned Listing, sorted by key:
+        [('RCLONE_TEST', 110, 946710000.0), ('file1.txt', 0, 946710000.0), ...]
+
+    rclone lsl lines have a fixed layout after the size field, so the fields are sliced out directly.  The local time
+    conversion is memoized per minute, so mktime runs once per distinct minute rather than once per line.  Lines not
+    in the exact rclone layout go thru load_line.
     """
-    d = {}
+    keys = []
+    sizes = array('q')
+    mtimes = array('d')
+    minutes = LSL_MINUTES
+    seconds = LSL_SECONDS
     try:
         line = "<none>"
         line_cnt = 0
-        with io.open(lslfile, mode='rt', encoding='utf8') as f:
-            for line in f:
-                line_cnt += 1
-                out = LINE_FORMAT.match(line)
-                if out:
-                    size = out.group(1)
-                    date = out.group(2)
-                    _time = out.group(3)
-                    microsec = out.group(4)
-                    date_time = time.mktime(datetime.strptime(date + ' ' + _time, '%Y-%m-%d %H:%M:%S').timetuple()) + float('.'+ microsec)
-                    filename = out.group(5)
-                    if filename in d:
-                        logging.warning (f"WARNING  Duplicate line in LSL file:   <{line[:-1]}>")
-                        strtime = datetime.fromtimestamp(d[filename]['datetime']).strftime("%Y-%m-%d %H:%M:%S.%f")
-                        logging.warning (f"         Prior found (keeping latest): <{d[filename]['size']:>9} {strtime}    {filename}>")
-                        if date_time > d[filename]['datetime']:
-                            d[filename] = {'size': size, 'datetime': date_time}
-                    else:
-                        d[filename] = {'size': size, 'datetime': date_time}
-
+        for line in lines:
+            line_cnt += 1
+            s = line.lstrip()
+            x = s.find(' ')                     # s[x] is the space after the size field
+            size = s[:x]
+            frac = s[x+21:x+30]
+            if (s[x+30:x+31] == ' ' and s[x+17] == ':' and s[x+20] == '.' and x > 0 and size.isdigit()
+                    and frac.isdigit() and size.isascii() and frac.isascii()):
+                date_time = minutes.get(s[x+1:x+17])
+                if date_time is None:
+                    date_time = lsl_minute(s[x+1:x+17])
+                sec = seconds.get(s[x+18:x+20])
+                if date_time is not None and sec is not None:
+                    date_time = date_time + sec + float('.' + frac)
+                    filename = s[x+31:-1] if s[-1] == '\n' else s[x+31:]
                 else:
-                    logging.warning("Something wrong with this line (ignored) in {}.  (Google Doc files cannot be synced.):\n   <{}>".format(lslfile, line))
-        return 0, collections.OrderedDict(sorted(d.items()))        # return Success and a sorted list
+                    size, date_time, filename = load_line(line)
+            else:
+                size, date_time, filename = load_line(line)
+
+            if filename is None:
+                logging.warning("Something wrong with this line (ignored) in {}.  (Google Doc files cannot be synced.):\n   <{}>".format(lslfile, line))
+            else:
+                keys.append(filename)
+                sizes.append(int(size))
+                mtimes.append(date_time)
+
+        return 0, sorted_listing(keys, sizes, mtimes)                # return Success and a sorted list
 
     except Exception as e:
-        logging.error(f"Exception in load_list loading <{lslfile}>:\n  <{e}>\n  Line # {line_cnt}:  {line}")
+        logging.error(f"Exception in load_lines loading <{lslfile}>:\n  <{e}>\n  Line # {line_cnt}:  {line}")
         return 1, ""                                                # return False
 
 
+def sorted_listing(keys, sizes, mtimes):
+    """
+    Build a Listing from unsorted, parallel keys/sizes/mtimes, as loaded from an lsl.
+    For duplicate keys a warning is printed and the first found is kept, unless a later one has a newer datetime.
+    """
+    order = sorted(range(len(keys)), key=keys.__getitem__)     # Stable, so duplicates stay in file order
+    def dedup():
+        prior = None
+        for x in order:
+            if prior is not None and keys[x] == keys[prior]:
+                strtime = datetime.fromtimestamp(mtimes[x]).strftime("%Y-%m-%d %H:%M:%S.%f")
+                logging.warning (f"WARNING  Duplicate line in LSL file:   <{sizes[x]:>9} {strtime}    {keys[x]}>")
+                strtime = datetime.fromtimestamp(mtimes[prior]).strftime("%Y-%m-%d %H:%M:%S.%f")
+                logging.warning (f"         Prior found (keeping latest): <{sizes[prior]:>9} {strtime}    {keys[prior]}>")
+                if mtimes[x] > mtimes[prior]:
+                    prior = x
+                continue
+            if prior is not None:
+                yield keys[prior], sizes[prior], mtimes[prior]
+            prior = x
+        if prior is not None:
+            yield keys[prior], sizes[prior], mtimes[prior]
+    return Listing(dedup())
+
+
+SAME_ENTRIES_ONES = (1).to_bytes(8, sys.byteorder)  # A 64 bit digit of one, for Listing.same_entries
+class Listing:
+    """
+    Compact, sorted, read-only file listing as loaded from an lsl file.
+    The keys are stored utf8 encoded back to back in one bytes blob, with offsets[x]:offsets[x+1] delimiting key x.
+    Sizes and datetimes (epoch) are typed arrays.  utf8 byte order is the same as str code point order, so lookups
+    are a binary search of the blob.  Per entry this costs the key length plus 24 bytes, versus several hundred bytes
+    for a dictionary of dictionaries.
+        listing.find('file1.txt')   -> index, or -1 if not found
+        listing.size(x), listing.mtime(x), listing.key(x)
+        'file1.txt' in listing, len(listing), iter(listing) for the keys in sorted order
+        listing.items()             -> (key, size, mtime) in sorted order
+    A directory's keys are a contiguous range, since they share its prefix.  See subtree_deltas.
+    """
+    def __init__(self, entries=(), columns=None):
+        """
+        entries is an iterable of (key, size, mtime), in sorted key order without duplicates.
+        Alternately, columns is an existing (blob, offsets, sizes, mtimes), as from load_snapshot.
+        """
+        if columns is not None:
+            self.blob, self.offsets, self.sizes, self.mtimes = columns
+            return
+        blob = bytearray()
+        self.offsets = array('Q', [0])
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        for key, size, mtime in entries:
+            blob += key.encode('utf8')
+            self.offsets.append(len(blob))
+            self.sizes.append(size)
+            self.mtimes.append(mtime)
+        self.blob = bytes(blob)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self, lo=0, hi=None):
+        """The keys from lo up to hi, or all of them."""
+        blob = self.blob
+        offsets = self.offsets
+        for x in range(lo, len(self.sizes) if hi is None else hi):
+            yield blob[offsets[x]:offsets[x+1]].decode('utf8')
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def items(self, lo=0, hi=None):
+        """(key, size, mtime) of the entries from lo up to hi, or of all of them."""
+        if lo == 0 and hi is None:
+            return zip(self.keys(), self.sizes, self.mtimes)
+        if hi is None:
+            hi = len(self.sizes)
+        return zip(self.keys(lo, hi), self.sizes[lo:hi], self.mtimes[lo:hi])
+
+    def key(self, x):
+        return self.blob[self.offsets[x]:self.offsets[x+1]].decode('utf8')
+
+    def size(self, x):
+        return self.sizes[x]
+
+    def mtime(self, x):
+        return self.mtimes[x]
+
+    def find(self, key):
+        """Return the index of key, or -1 if not in the listing."""
+        target = key.encode('utf8')
+        x = self.bisect(target)
+        if x < len(self.sizes) and self.blob[self.offsets[x]:self.offsets[x+1]] == target:
+            return x
+        return -1
+
+    def bisect(self, target, lo=0, hi=None):
+        """Return the index of the first key from lo up to hi not less than the utf8 encoded target."""
+        blob = self.blob
+        offsets = self.offsets
+        if hi is None:
+            hi = len(self.sizes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if blob[offsets[mid]:offsets[mid+1]] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get(self, key):
+        """Return (size, mtime) for key, or None if not in the listing."""
+        x = self.find(key)
+        if x < 0:
+            return None
+        return self.sizes[x], self.mtimes[x]
+
+    def same_keys(self, other):
+        """
+        Return True if the other Listing has the same keys.  The key blobs, and the offsets where they start at the
+        same place, are compared whole, at memory speed.  Listings stored differently, as one mapped from a snapshot
+        and one built, are compared key by key.
+        """
+        entries = len(self.sizes)
+        if entries != len(other.sizes):
+            return False
+        if entries == 0:
+            return True
+        start, end = self.offsets[0], self.offsets[entries]
+        other_start, other_end = other.offsets[0], other.offsets[entries]
+        if self.blob[start:end] != other.blob[other_start:other_end]:
+            return False
+        if start == other_start:
+            return self.offsets == other.offsets
+        return next(listing_mismatches(self, other), None) is None
+
+    def same_entries(self, lo, hi, other, other_lo, other_hi):
+        """
+        Return True if the entries lo up to hi are the same as the other Listing's entries other_lo up to other_hi,
+        keys, sizes and mtimes.  The columns are compared as whole slices, at memory speed.
+        """
+        if hi - lo != other_hi - other_lo:
+            return False
+        if (self.sizes[lo:hi] != other.sizes[other_lo:other_hi] or self.mtimes[lo:hi] != other.mtimes[other_lo:other_hi]
+                or self.blob[self.offsets[lo]:self.offsets[hi]] != other.blob[other.offsets[other_lo]:other.offsets[other_hi]]):
+            return False
+        # The same blob bytes may yet be split into different keys, so the offsets must match, less the difference
+        # of where the keys start.  As one integer of 64 bit digits, the offsets plus that difference in each digit.
+        shift = other.offsets[other_lo] - self.offsets[lo]
+        offsets = int.from_bytes(memoryview(self.offsets)[lo:hi+1], sys.byteorder)
+        other_offsets = int.from_bytes(memoryview(other.offsets)[other_lo:other_hi+1], sys.byteorder)
+        if shift < 0:
+            shift, offsets, other_offsets = -shift, other_offsets, offsets
+        return other_offsets == offsets + shift * int.from_bytes(SAME_ENTRIES_ONES * (hi - lo + 1), sys.byteorder)
+
+
+def lsl_minute(date_minute):
+    """
+    Return the epoch time of a 'YYYY-MM-DD HH:MM' local time string, or None if it is not in that form.
+    Results are memoized in LSL_MINUTES.  Invalid dates are not memoized so that they take the load_line path.
+    """
+    digits = date_minute[:4] + date_minute[5:7] + date_minute[8:10] + date_minute[11:13] + date_minute[14:16]
+    if (date_minute[4:5] != '-' or date_minute[7:8] != '-' or date_minute[10:11] != ' ' or date_minute[13:14] != ':'
+            or len(digits) != 12 or not digits.isdigit() or not digits.isascii()):
+        return None
+    try:
+        epoch = time.mktime(datetime(int(date_minute[:4]), int(date_minute[5:7]), int(date_minute[8:10]),
+                                     int(date_minute[11:13]), int(date_minute[14:16])).timetuple())
+    except ValueError:
+        return None
+    LSL_MINUTES[date_minute] = epoch
+    return epoch
+
+
+def lsl_line_key(line):
+    """Return the key of an lsl line as load_lines loads it, or None for a line that load_lines ignores."""
+    s = line.lstrip()
+    x = s.find(' ')
+    if (s[x+30:x+31] == ' ' and s[x+17] == ':' and s[x+20] == '.' and x > 0 and s[:x].isdigit()
+            and s[x+21:x+30].isdigit() and s[:x].isascii() and s[x+21:x+30].isascii()):
+        return s[x+31:-1] if s[-1] == '\n' else s[x+31:]
+    return load_line(line)[2]
+
+
+def load_line(line):
+    """
+    Parse one lsl line with the LINE_FORMAT regex.  Used by load_list for lines not in the exact rclone lsl layout.
+    Returns (size, datetime, filename), or (None, None, None) if the line does not match.
+    """
+    out = LINE_FORMAT.match(line)
+    if not out:
+        return None, None, None
+    size = out.group(1)
+    date = out.group(2)
+    _time = out.group(3)
+    microsec = out.group(4)
+    date_time = time.mktime(datetime.strptime(date + ' ' + _time, '%Y-%m-%d %H:%M:%S').timetuple()) + float('.'+ microsec)
+    return size, date_time, out.group(5)
+
+
+DELTA_NEW     = 'new'                                # Delta tokens yielded by listing_deltas.
+DELTA_NEWER   = 'newer'
+DELTA_OLDER   = 'older'
+DELTA_DELETED = 'deleted'
+DELTA_SIZE    = 'size'
+def listing_deltas(prior, now, sizes=False):
+    """
+    Walk the prior and now listings in lockstep and yield (key, size, mtime, delta) for each changed key.
+    prior and now are iterables of (key, size, mtime) in sorted key order, such as Listing.items(), so only the
+    current entry of each is held.  delta is one of the DELTA_ tokens.  size and mtime are from now, or from
+    prior for a deleted key.  Unchanged keys are not yielded.
+    With sizes, a key with an unchanged mtime but a changed size is yielded as DELTA_SIZE.
+    """
+    prior = iter(prior)
+    now = iter(now)
+    p = next(prior, None)
+    n = next(now, None)
+    while p is not None and n is not None:
+        if p[0] == n[0]:
+            if p[2] != n[2]:
+                if p[2] < n[2]:
+                    yield n[0], n[1], n[2], DELTA_NEWER
+                else:               # Current version is older than prior sync.
+                    yield n[0], n[1], n[2], DELTA_OLDER
+            elif sizes and p[1] != n[1]:
+                yield n[0], n[1], n[2], DELTA_SIZE
+            p = next(prior, None)
+            n = next(now, None)
+        elif p[0] < n[0]:
+            yield p[0], p[1], p[2], DELTA_DELETED
+            p = next(prior, None)
+        else:
+            yield n[0], n[1], n[2], DELTA_NEW
+            n = next(now, None)
+    while p is not None:
+        yield p[0], p[1], p[2], DELTA_DELETED
+        p = next(prior, None)
+    while n is not None:
+        yield n[0], n[1], n[2], DELTA_NEW
+        n = next(now, None)
+
+
+def listing_mismatches(listing1, listing2):
+    """
+    Walk the sorted keys of the two Listings in lockstep and yield (key, "Path1") for each key only in listing1,
+    and (key, "Path2") for each only in listing2.  The keys are compared as their utf8 bytes, in the Listing order,
+    and only those yielded are decoded.
+    """
+    blob1, offsets1, entries1 = listing1.blob, listing1.offsets, len(listing1)
+    blob2, offsets2, entries2 = listing2.blob, listing2.offsets, len(listing2)
+    x1 = x2 = 0
+    while x1 < entries1 and x2 < entries2:
+        key1 = blob1[offsets1[x1]:offsets1[x1+1]]
+        key2 = blob2[offsets2[x2]:offsets2[x2+1]]
+        if key1 == key2:
+            x1 += 1
+            x2 += 1
+        elif key1 < key2:
+            yield key1.decode('utf8'), "Path1"
+            x1 += 1
+        else:
+            yield key2.decode('utf8'), "Path2"
+            x2 += 1
+    for x in range(x1, entries1):
+        yield listing1.key(x), "Path1"
+    for x in range(x2, entries2):
+        yield listing2.key(x), "Path2"
+
+
+SUBTREE_LINEAR = 1000                               # Directories of up to this many entries are walked by listing_deltas.
+def subtree_deltas(prior, now, sizes=False):
+    """
+    listing_deltas of the prior and now Listings, found top-down by directory.  A directory's entries in both
+    listings are compared whole (Listing.same_entries) and only a directory that differs is descended into, so on a
+    largely unchanged tree the cost is in proportion to the changes rather than to the number of files.  A small
+    directory that differs, or one with no subdirectories, is walked key by key by listing_deltas.  The changes are
+    yielded in the same key order as by listing_deltas.
+    """
+    def children(listing, prefix, lo, hi):
+        """
+        Yield (name, lo, hi) for each file and subdirectory in the listing's entries lo up to hi of the directory
+        prefix, in key order.  name is the utf8 key of a file, or the prefix of a subdirectory, with its '/'.
+        """
+        blob = listing.blob
+        offsets = listing.offsets
+        depth = len(prefix)
+        x = lo
+        while x < hi:
+            key = blob[offsets[x]:offsets[x+1]]
+            slash = key.find(b'/', depth)
+            if slash < 0:
+                yield key, x, x + 1
+                x += 1
+            else:
+                name = key[:slash + 1]
+                end = name[:-1] + b'0'              # '0' follows '/', so the first key after the subdirectory's
+                below = x                           # Galloping ahead, as most subdirectories are a small part
+                step = 1
+                while below + step < hi and blob[offsets[below+step]:offsets[below+step+1]] < end:
+                    below += step
+                    step *= 2
+                end = listing.bisect(end, below + 1, min(below + step, hi))
+                yield name, x, end
+                x = end
+
+    def flat(listing, prefix, lo, hi):
+        """Return True if the listing's entries lo up to hi of the directory prefix include no subdirectories."""
+        return listing.blob[listing.offsets[lo]:listing.offsets[hi]].count(b'/') == (hi - lo) * prefix.count(b'/')
+
+    def directory(prefix, prior_lo, prior_hi, now_lo, now_hi):
+        if (prior_hi - prior_lo + now_hi - now_lo <= SUBTREE_LINEAR
+                or flat(prior, prefix, prior_lo, prior_hi) and flat(now, prefix, now_lo, now_hi)):
+            yield from listing_deltas(prior.items(prior_lo, prior_hi), now.items(now_lo, now_hi), sizes)
+            return
+        prior_children = children(prior, prefix, prior_lo, prior_hi)
+        now_children = children(now, prefix, now_lo, now_hi)
+        p = next(prior_children, None)
+        n = next(now_children, None)
+        while p is not None or n is not None:
+            if p is not None and n is not None and p[0] == n[0]:
+                if not prior.same_entries(p[1], p[2], now, n[1], n[2]):
+                    yield from directory(p[0], p[1], p[2], n[1], n[2])
+                p = next(prior_children, None)
+                n = next(now_children, None)
+            elif n is None or p is not None and p[0] < n[0]:
+                yield from listing_deltas(prior.items(p[1], p[2]), (), sizes)
+                p = next(prior_children, None)
+            else:
+                yield from listing_deltas((), now.items(n[1], n[2]), sizes)
+                n = next(now_children, None)
+
+    if prior.same_entries(0, len(prior), now, 0, len(now)):
+        return iter(())
+    return directory(b'', 0, len(prior), 0, len(now))
+
+
+def get_deltas(path_text, prior, now):
+    """
+    Find and log the changes on a path relative to the prior sync.
+    path_text is "Path1" or "Path2", for logging.
+    prior and now are the prior sync and current Listings.
+    Returns the deltas, the number of deleted files, and whether at least one file was found unchanged.
+    The deltas are an OrderedDict, in key order, of
+        {'new':False, 'newer':True, 'older':False, 'size':False, 'deleted':False, 'stamp':(size, mtime)}
+    where the stamp is the current size and mtime, or the prior ones for a deleted key.
+    """
+    deltas = collections.OrderedDict()
+    news = newers = olders = resizes = deletes = 0
+    for key, size, mtime, delta in subtree_deltas(prior, now, sizes=args.compare != 'modtime'):
+        if delta == DELTA_DELETED:
+            logging.info(print_msg(path_text, "  File was deleted", key))
+            deletes += 1
+        elif delta == DELTA_NEWER:
+            logging.info(print_msg(path_text, "  File is newer", key))
+            newers += 1
+        elif delta == DELTA_OLDER:
+            logging.info(print_msg(path_text, "  File is OLDER", key))
+            olders += 1
+        elif delta == DELTA_SIZE:
+            logging.info(print_msg(path_text, "  File size changed", key))
+            resizes += 1
+        else:
+            logging.info(print_msg(path_text, "  File is new", key))
+            news += 1
+        deltas[key] = {'new':delta == DELTA_NEW, 'newer':delta == DELTA_NEWER, 'older':delta == DELTA_OLDER,
+                       'size':delta == DELTA_SIZE, 'deleted':delta == DELTA_DELETED, 'stamp':(size, mtime)}
+
+    if len(deltas) > 0:
+        if resizes:
+            logging.info(f"  {len(deltas):4} file change(s) on {path_text}: {news:4} new, {newers:4} newer, {olders:4} older, {resizes:4} size changed, {deletes:4} deleted")
+        else:
+            logging.info(f"  {len(deltas):4} file change(s) on {path_text}: {news:4} new, {newers:4} newer, {olders:4} older, {deletes:4} deleted")
+
+    # Once we've found at least 1 unchanged file we know that not everything has changed, as with a DST time change
+    found_same = len(prior) > deletes + newers + olders + resizes
+    return deltas, deletes, found_same
+
+
+def refresh_lsl(path12, lsl_file, lsl_file_new=None, listing=None, removed=(), listed=()):
+    """
+    Bring the lsl_file history up to date for path12, and return (status, Listing) for it.
+    Without listing, path12 is re-listed to the lsl_file and loaded.
+    Otherwise listing is the Listing loaded from lsl_file_new, the listing of path12 from before changes were applied.
+        removed is a set of keys deleted or renamed away on path12.
+        listed is a list of keys copied or renamed to path12.
+    If nothing was changed on path12 (or --dry-run), lsl_file_new is copied to lsl_file.
+    Else only the listed keys are re-listed, and lsl_file_new is patched with them into the lsl_file.
+    """
+    if listing is None:
+        return rclone_lsl(path12, lsl_file, filter_file=user_filter_file)
+    if dry_run or (len(removed) == 0 and len(listed) == 0):
+        shutil.copy2(lsl_file_new, lsl_file + '_TMP')
+        os.replace(lsl_file + '_TMP', lsl_file)         # The prior history stays whole until replaced
+        return 0, listing
+    return patch_lsl(path12, lsl_file_new, lsl_file, listing, removed, listed)
+
+
+def patch_lsl(path12, lines_file, lsl_file, listing, removed, listed):
+    """
+    Write the lsl_file as the lines_file less the removed keys, and with the listed keys re-listed from path12.
+    Returns (status, Listing) for the lsl_file.  listing is the Listing loaded from lines_file.
+    """
+    listed_file = lsl_file + '_LISTED'
+    with io.open(listed_file, mode='wt', encoding='utf8') as outf:
+        for key in listed:
+            outf.write(key + "\n")
+    status, relisted = rclone_lsl(path12, lsl_file + '_RELIST', filter_file=user_filter_file,
+                                  options=["--files-from-raw", listed_file])
+    if status:
+        return status, None
+
+    # Keys not in the relisted were not copied, eg deleted from the source while synching, so keep their prior entry
+    drop = set(removed)
+    drop.update(relisted)
+    with io.open(lsl_file + '_TMP', mode='wt', encoding='utf8', newline='') as of:
+        for in_file in (lines_file, lsl_file + '_RELIST'):
+            with io.open(in_file, mode='rt', encoding='utf8', newline='') as f:
+                for line in f:
+                    if in_file != lines_file or lsl_line_key(line) not in drop:
+                        of.write(line)
+    os.replace(lsl_file + '_TMP', lsl_file)
+    if not args.no_cleanup:
+        os.remove(listed_file)
+        os.remove(lsl_file + '_RELIST')
+
+    kept = ((key, size, mtime) for key, size, mtime in listing.items() if key not in drop)
+    return 0, Listing(heapq.merge(kept, relisted.items()))
+
+
+def concurrently(*calls):
+    """
+    Run each of the calls, a tuple of (function, arg, ...), in its own thread and return their results in order.
+    Used to overlap the Path1 and Path2 rclone listings and their parsing, which mostly wait on rclone subprocesses.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = [pool.submit(call[0], *call[1:]) for call in calls]
+        return [future.result() for future in futures]
+
+
+SNAPSHOT_MAGIC = b'RCSNAP01'
+SNAPSHOT_HEADER = struct.Struct('=8sQQQq')           # magic, entries, blob length, lsl file size, lsl file mtime_ns
+def save_snapshot(listing, lsl_file):
+    """
+    Write the listing to lsl_file + '_SNAPSHOT' in the layout of the Listing columns, for load_snapshot on the next run.
+    Layout:  header, offsets (entries+1 x uint64), sizes (entries x int64), mtimes (entries x double), key blob.
+    The offsets are stored relative to the start of the file, so the mapped file is used as the blob as-is.
+    The size and mtime of lsl_file are recorded in the header.  The snapshot is only used while they still match,
+    so the text lsl_file remains the reference and may be replaced or edited.
+    A failure is only a warning, since the next run then falls back to the lsl_file.
+    """
+    snapshot_file = lsl_file + '_SNAPSHOT'
+    try:
+        lsl_stat = os.stat(lsl_file)
+        entries = len(listing)
+        blob_start = listing.offsets[0]
+        blob_len = listing.offsets[entries] - blob_start
+        file_blob_start = SNAPSHOT_HEADER.size + 8 * (3 * entries + 1)
+        offsets = array('Q', (offset - blob_start + file_blob_start for offset in listing.offsets))
+        with io.open(snapshot_file + '_TMP', mode='wb') as of:
+            of.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, entries, blob_len, lsl_stat.st_size, lsl_stat.st_mtime_ns))
+            of.write(offsets)
+            of.write(memoryview(listing.sizes).cast('B'))
+            of.write(memoryview(listing.mtimes).cast('B'))
+            of.write(listing.blob[blob_start:blob_start + blob_len])
+        os.replace(snapshot_file + '_TMP', snapshot_file)
+    except Exception as e:
+        logging.warning(f"WARNING  Could not save listing snapshot <{snapshot_file}>:  <{e}>")
+        if os.path.exists(snapshot_file):
+            os.remove(snapshot_file)
+
+
+def load_snapshot(lsl_file):
+    """
+    Return a Listing mapped from lsl_file + '_SNAPSHOT', or None if there is no usable snapshot for the lsl_file.
+    Nothing is parsed or copied, so this takes about the same time for any number of entries.
+    """
+    snapshot_file = lsl_file + '_SNAPSHOT'
+    if not os.path.exists(snapshot_file) or not os.path.exists(lsl_file):
+        return None
+    try:
+        lsl_stat = os.stat(lsl_file)
+        with io.open(snapshot_file, mode='rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, entries, blob_len, lsl_size, lsl_mtime = SNAPSHOT_HEADER.unpack_from(mapped)
+        blob_start = SNAPSHOT_HEADER.size + 8 * (3 * entries + 1)
+        if (magic != SNAPSHOT_MAGIC or lsl_size != lsl_stat.st_size or lsl_mtime != lsl_stat.st_mtime_ns
+                or len(mapped) != blob_start + blob_len):
+            logging.debug(f"    Snapshot <{snapshot_file}> does not match <{lsl_file}> - not used")
+            mapped.close()
+            return None
+        view = memoryview(mapped)
+        start = SNAPSHOT_HEADER.size
+        offsets = view[start:start + 8 * (entries + 1)].cast('Q')
+        start += 8 * (entries + 1)
+        sizes = view[start:start + 8 * entries].cast('q')
+        start += 8 * entries
+        mtimes = view[start:start + 8 * entries].cast('d')
+        return Listing(columns=(mapped, offsets, sizes, mtimes))
+    except Exception as e:
+        logging.warning(f"WARNING  Could not load listing snapshot <{snapshot_file}>:  <{e}>")
+        return None
+
+
 def get_and_load_lsl (path_text, lsl_file, path12=None):
     """
-    Optionally call for an rclone lsl of the referenced path12, written to the lsl_file.
-    Then load the lsl file content into into a dictionary and return the dictionary to the caller.
+    Optionally call for an rclone lsl of the referenced path12, written to the lsl_file and loaded as it is listed.
+    Else load the lsl file content.  The Listing is returned to the caller.
+    Without path12 a current snapshot of the lsl_file is used if there is one, rather than parsing the lsl_file.
+    With path12 a --shared-listing of the path, cut for this pair, is used rather than an rclone lsl.
     path_text is a convenience string for logging, eg "Path2 prior"
     lsl_file is the full path string for file to be written to by the rclone lsl, and read from for loading the content.
     path12 is a string to be passed to the rclone lsl, eg "Dropbox:"
     """
-    if path12 is not None:
-        if rclone_lsl(path12, lsl_file, filter_file=user_filter_file):
+    shared_file = shared_listings.get((lock_file, path12))
+    if path12 is not None and shared_file is not None and os.path.exists(shared_file):
+        logging.debug(f"    Using the shared listing <{shared_file}> for {path_text}")
+        shutil.move(shared_file, lsl_file)
+        status, loaded_list = load_list(lsl_file)
+    elif path12 is not None:
+        status, loaded_list = rclone_lsl(path12, lsl_file, filter_file=user_filter_file)
+        if status:
             return RTN_ABORT, None
-    status, loaded_list = load_list(lsl_file)
+    else:
+        loaded_list = load_snapshot(lsl_file)
+        if loaded_list is not None:
+            status = 0
+            logging.debug(f"    Loaded {path_text} from snapshot <{lsl_file + '_SNAPSHOT'}>")
+        else:
+            status, loaded_list = load_list(lsl_file)
     if status:
         logging.error(print_msg("ERROR", f"Failed loading {path_text} list file <{lsl_file}>"))
         return RTN_ABORT, None
@@ -682,6 +2295,21 @@ def get_and_load_lsl (path_text, lsl_file, path12=None):
     return 0, loaded_list
 
 
+def scoped_lsl(path_text, path12, lsl_file, lsl_file_new, scope):
+    """
+    For a --watch pass, write lsl_file_new as the prior lsl_file with the scope keys re-listed from path12, and
+    return (status, Listing) for it.  Changes to keys not in scope are not seen until the next full pass.
+    """
+    status, prior = get_and_load_lsl(f"{path_text} prior", lsl_file)
+    if status:
+        return status, None
+    status, listing = patch_lsl(path12, lsl_file, lsl_file_new, prior, scope, sorted(scope))
+    if status:
+        logging.error(print_msg("ERROR", f"Failed listing the changed files of {path_text}", path12))
+        return RTN_ABORT, None
+    return 0, listing
+
+
 def request_lock(caller, lock_file):
     for _ in range(5):
         if os.path.exists(lock_file):
@@ -707,6 +2335,10 @@ def release_lock(lock_file):
         return -1
 
 def keyboardInterruptHandler(signal, frame):
+    if resumable():
+        logging.error("***** KeyboardInterrupt Critical Error Abort - Run rclonesync again to resume. *****\n")
+        release_lock(lock_file)
+        sys.exit(2)
     logging.error("***** KeyboardInterrupt Critical Error Abort - Must run --first-sync to recover.  See README.md *****\n")
     if os.path.exists(path2_lsl_file):
         shutil.move(path2_lsl_file, path2_lsl_file + '_ERROR')
@@ -715,13 +2347,631 @@ def keyboardInterruptHandler(signal, frame):
     release_lock(lock_file)
     sys.exit(2)
 signal.signal(signal.SIGINT, keyboardInterruptHandler)
+
+
+def resumable():
+    """
+    True if the run was stopped after journaling its changes, with the journal in place, so the next run can
+    resume it.  A critical error before then, such as a failed access check, is not resumed from the journal of
+    an earlier run.
+    """
+    return journal is not None and journal.planned and os.path.exists(journal.journal_file)
     
 
+# ***** Run setup, shared by the single pair and --pairs runs *****
+def set_args(run_args):
+    """Set args and the option globals derived from it, for the run or for one pair of a --pairs run."""
+    global args, first_sync, check_access, chk_file, max_deletes, verbose, rc_verbose, user_filter_file, rclone
+    global dry_run, force, rmdirs
+    args         =  run_args
+    first_sync   =  args.first_sync
+    check_access =  args.check_access
+    chk_file     =  args.check_filename
+    max_deletes  =  args.max_deletes
+    verbose      =  args.verbose
+    rc_verbose   =  args.rc_verbose
+    if rc_verbose == None: rc_verbose = 0
+    user_filter_file =  args.filters_file
+    rclone       =  args.rclone
+    dry_run      =  args.dry_run
+    force        =  args.force
+    rmdirs       =  args.remove_empty_directories
+
+
+def set_up_logging(prefix=''):
+    """Set the log format and level per args.  prefix starts each message, eg to tell apart the --pairs runs."""
+    if not args.no_datetime_log:
+        log_format = '%(asctime)s:  ' + prefix + '%(message)s'    # /%(levelname)s/%(module)s/%(funcName)s
+    else:
+        log_format = prefix + '%(message)s'
+    if not logging.getLogger().handlers:
+        logging.basicConfig(format=log_format)
+    else:
+        for handler in logging.getLogger().handlers:
+            handler.setFormatter(logging.Formatter(log_format))
+
+    if verbose >= 2:
+        logging.getLogger().setLevel(logging.DEBUG)             # Log debug detail
+    elif verbose>0 or rc_verbose>0 or force or first_sync or dry_run:
+        logging.getLogger().setLevel(logging.INFO)              # Log each file transaction
+    else:
+        logging.getLogger().setLevel(logging.WARNING)           # Log only unusual events.  Normally silent.
+
+
+def check_workdir(path):
+    """Return the workdir path, ending in '/', creating the directory if needed.  Exits if it cannot be accessed."""
+    if not (path.endswith('/') or path.endswith('\\')):       # 2nd check is for Windows paths
+        path += '/'
+    try:
+        if not os.path.exists(path):
+            os.makedirs(path)
+    except Exception as e:
+        logging.error(f"ERROR  Cannot access workdir at <{path}>.")
+        sys.exit(1)
+    return path
+
+
+def positive_int(text):
+    """argparse type for the counts that must be at least 1, such as --workers."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def pathparse(path):
+    """Handle variations in a path argument.
+    Cloud:              - Root of the defined cloud
+    Cloud:some/path     - Supported with our without path leading '/'s
+    X:                  - Windows drive letter
+    X:\\some\\path      - Windows drive letter with absolute or relative path
+    some/path           - Relative path from cwd (and on current drive on Windows)
+    //server/path       - UNC paths are supported
+    On Windows a one-character cloud name is not supported - it will be interprested as a drive letter.
+    """
+    _cloud = False
+    path_base = ''
+    if ':' in path:
+        if len(path) == 1:                                  # Handle corner case of ':' only passed in
+            logging.error("ERROR  Path argument <{}> not a legal path.".format(path))
+            sys.exit(1)
+        if path[1] == ':' and is_Windows:                   # Windows drive letter case
+            path_base = path
+            if not path_base.endswith('\\'):                # For consistency ensure the path ends with '/'
+                path_base += '/'
+        else:                                               # Cloud case with optional path part
+            # path_FORMAT = re.compile(r'([\w-]+):(.*)')
+            path_FORMAT = re.compile(r'([ \w-]+):(.*)')
+            out = path_FORMAT.match(path)
+            if out:
+                _cloud = True
+                cloud_name = out.group(1) + ':'
+                if cloud_name not in clouds:
+                    logging.error(f"ERROR  Path argument <{cloud_name}> not in list of configured Clouds: {clouds}.")
+                    sys.exit(1)
+                path_part = out.group(2)
+                if path_part:
+                    if not (path_part.endswith('/') or path_part.endswith('\\')):    # 2nd check is for Windows paths
+                        path_part += '/'
+                path_base = cloud_name + path_part
+    else:                                                   # Local path (without Windows drive letter)
+        path_base = path
+        if not (path_base.endswith('/') or path_base.endswith('\\')):
+            path_base += '/'
+
+    if not _cloud:
+        if not os.path.exists(path_base):
+            logging.error(f"ERROR  Local path parameter <{path_base}> cannot be accessed.  Path error?")
+            sys.exit(1)
+
+    return path_base
+
+
+def path_remote(path_base):
+    """The remote of a pathparse'd path, eg 'gdrive:' for 'gdrive:Book/', or None for a local path."""
+    if ':' not in path_base or (is_Windows and path_base[1] == ':'):
+        return None
+    return path_base[:path_base.index(':') + 1]
+
+
+def lock_file_name(path1_base, path2_base):
+    return os.path.join(tempfile.gettempdir(), 'rclonesync_LOCK_' + (
+        path1_base + path2_base).replace(':','_').replace(r'/','_').replace('\\','_'))
+
+
+def sync_pair(path1, path2):
+    """
+    Run bidirSync for the Path1/Path2 pair, under its lock.  Returns the exit code for the run.
+    The run's metrics are written for any exit code, per --metrics-file and --metrics-textfile.
+    """
+    global path1_base, path2_base, lock_file, metrics
+    path1_base = pathparse(path1)
+    path2_base = pathparse(path2)
+    lock_file = lock_file_name(path1_base, path2_base)
+    metrics = RunMetrics(path1_base, path2_base)
+    exit_code = locked_sync()
+    metrics.finish(exit_code)
+    metrics.write()
+    return exit_code
+
+
+def locked_sync():
+    """sync_pair's run of bidirSync under the lock, returning the exit code."""
+    if request_lock(sys.argv, lock_file) == 0:
+        status = bidirSync()
+        release_lock(lock_file)
+        if status == RTN_CRITICAL and resumable():
+            logging.error("***** Critical Error Abort - Run rclonesync again to resume.  See the journal <{}> *****\n".format(journal.journal_file))
+            return 2
+        if status == RTN_CRITICAL:
+            logging.error("***** Critical Error Abort - Must run --first-sync to recover.  See README.md *****\n")
+            if os.path.exists(path2_lsl_file):
+                shutil.move(path2_lsl_file, path2_lsl_file + '_ERROR')
+            if os.path.exists(path1_lsl_file):
+                shutil.move(path1_lsl_file, path1_lsl_file + '_ERROR')
+            return 2
+        if status == RTN_ABORT:
+            logging.error("***** Error Abort.  Try running rclonesync again. *****\n")
+            return 1
+        logging.info(">>>>> Successful run.  All done.\n")
+        return 0
+    else:
+        logging.warning("***** Prior lock file in place, aborting.  Try running rclonesync again. *****\n")
+        return 1
+
+
+# ***** --watch mode *****
+IN_MODIFY_EVENTS = 0x00000004 | 0x00000008 | 0x00000040 | 0x00000080 | 0x00000100 | 0x00000200
+                                                    # IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct('iIII')               # wd, mask, cookie, name length
+class Inotify:
+    """
+    Minimal inotify watch of a local directory tree, thru libc (Linux only), for --watch.
+    read returns the paths touched, relative to the root, and if a directory was changed (or the event queue
+    overflowed) such that the whole tree must be re-listed.  Directories created in the tree are watched as found.
+    A directory that cannot be watched or scanned, as one removed as it is found, or past the watch limit, is also
+    a changed tree, so the next pass is a full pass.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}                              # Watch descriptor: directory, relative to root, eg 'sub/dir/'
+        self.add_tree('')
+
+    def add_tree(self, rel):
+        """
+        Watch the rel directory and those under it.  Raises OSError if the directory cannot be watched, other than
+        as already gone.  Subdirectories that cannot be scanned are skipped, and their watches are left to a
+        later add_tree.
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(self.root + rel), IN_MODIFY_EVENTS)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            if errno in (2, 20):                    # ENOENT or ENOTDIR, the directory is already gone or replaced
+                return
+            raise OSError(errno, f"inotify_add_watch failed for <{self.root + rel}>.  Raise fs.inotify.max_user_watches?")
+        self.dirs[wd] = rel
+        try:
+            with os.scandir(self.root + rel) as entries:
+                subdirs = [entry.name for entry in entries if entry.is_dir(follow_symlinks=False)]
+        except OSError:                             # Removed since watched, or not readable
+            return
+        for name in subdirs:
+            self.add_tree(rel + name + '/')
+
+    def read(self, timeout):
+        """Wait up to timeout seconds for events.  Returns (set of touched paths, True if a directory changed)."""
+        touched = set()
+        tree_changed = False
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return touched, tree_changed
+        data = os.read(self.fd, 1024 * 1024)
+        x = 0
+        while x < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, x)
+            name = data[x + INOTIFY_EVENT.size:x + INOTIFY_EVENT.size + length].rstrip(b'\0')
+            x += INOTIFY_EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                tree_changed = True
+            elif mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+            elif wd in self.dirs and name:
+                try:
+                    rel = self.dirs[wd] + name.decode('utf8')
+                except UnicodeDecodeError:
+                    tree_changed = True
+                    continue
+                if mask & IN_ISDIR:
+                    tree_changed = True
+                    if mask & (0x00000080 | 0x00000100):            # IN_MOVED_TO, IN_CREATE
+                        try:
+                            self.add_tree(rel + '/')
+                        except OSError as e:
+                            logging.warning(print_msg("WARNING", f"Not watching a new directory:  {e}", rel))
+                else:
+                    touched.add(rel)
+        return touched, tree_changed
+
+
+watch_scope = None                                  # The keys re-listed by a --watch pass, else None for a full pass
+WATCH_RETRY = 60                                    # Seconds to the next full --watch pass after a failed pass
+def watch_pair(path1, path2):
+    """
+    --watch:  Sync the pair, then watch Path1 (local, Linux only) for changes.  After each burst of changes, once
+    quiet for args.watch_debounce seconds, run a pass re-listing only the touched files on both paths.  The pass is
+    a bidirSync, with its decisions and safety checks, under the pair lock as a separate run would be.
+    A full pass is run every args.watch_full_interval seconds, to pick up the Path2 changes, and in place of a
+    scoped pass after a directory is changed (or the event queue overflows), and WATCH_RETRY seconds after a
+    failed pass.  Runs until interrupted (while idle), or a critical error.  Returns the exit code.
+    """
+    global watch_scope, first_sync
+    path1_base = pathparse(path1)
+    if platform.system() != "Linux" or path_remote(path1_base) is not None:
+        logging.error("ERROR  --watch needs a local Path1, on Linux.")
+        return 1
+    try:
+        inotify = Inotify(path1_base)
+    except OSError as e:
+        logging.error(f"ERROR  Cannot watch <{path1_base}>.\nError message: {e}.")
+        return 1
+    logging.warning(f">>>>> Watching <{path1_base}> for changes")
+
+    full = True                                     # The next pass is a full pass
+    next_full = not_before = time.monotonic()       # Time of the next full pass, and no pass before not_before
+    touched = set()
+    while True:
+        signal.signal(signal.SIGINT, signal.default_int_handler)   # Interrupting while idle is a clean exit
+        try:
+            if touched or full:
+                timeout = max(args.watch_debounce, not_before - time.monotonic())
+            else:
+                timeout = max(0, next_full - time.monotonic())
+            new_touched, tree_changed = inotify.read(timeout)
+        except KeyboardInterrupt:
+            logging.warning(">>>>> Watch interrupted.  All done.\n")
+            return 0
+        except OSError as e:
+            logging.warning(print_msg("WARNING", f"Watch failed, running a full pass:  {e}", path1_base))
+            new_touched, tree_changed = set(), True
+        if new_touched or tree_changed:
+            touched.update(new_touched)
+            full = full or tree_changed
+            continue                                # Not yet quiet
+        now = time.monotonic()
+        if now < not_before or (not touched and not full and now < next_full):
+            continue
+        signal.signal(signal.SIGINT, keyboardInterruptHandler)
+
+        if full or now >= next_full:
+            logging.warning(">>>>> Watch full pass")
+            watch_scope = None
+            next_full = now + args.watch_full_interval
+        else:
+            logging.warning(f">>>>> Watch pass for {len(touched)} changed paths")
+            watch_scope = touched
+        status = sync_pair(path1, path2)
+        watch_scope = None
+        touched = set()
+        full = False
+        first_sync = False
+        if status == RTN_CRITICAL:
+            return status
+        if status:
+            full = True
+            not_before = time.monotonic() + WATCH_RETRY
+
+
+# ***** --pairs runner *****
+def load_pairs(pairs_file, parser):
+    """
+    Read the --pairs file.  Each line is a Path1 Path2 pair, optionally followed by rclonesync switches for that
+    pair, which are added to the command line ones (but not --pairs or --watch).  Blank lines and # comments are
+    ignored.  EG:
+        /home/me/Documents/Book/         gdrive:Book
+        /home/me/Documents/MyDocuments/  gdrive:MyDocuments  --filters-file /home/me/MyDocuments_filters
+    Returns a list of (pair args, label, lock file, remotes, (path1_base, path2_base)) tuples, or None if the file
+    has errors.
+    """
+    pairs = []
+    try:
+        with io.open(pairs_file, mode='rt', encoding='utf8') as f:
+            lines = f.readlines()
+    except Exception as e:
+        logging.error(f"ERROR  Cannot read pairs file <{pairs_file}>.\nError message: {e}.")
+        return None
+    for line_num, line in enumerate(lines, 1):
+        words = shlex.split(line, comments=True)
+        if not words:
+            continue
+        try:
+            pair_args = parser.parse_args(words, namespace=copy.copy(args))
+        except SystemExit:
+            pair_args = None
+        if pair_args is None or pair_args.Path2 is None or pair_args.pairs != args.pairs or pair_args.watch:
+            logging.error(f"ERROR  Invalid pair at line {line_num} of <{pairs_file}>:  {line.strip()}")
+            return None
+        try:                                        # pathparse logs a bad path and exits
+            path1_base = pathparse(pair_args.Path1)
+            path2_base = pathparse(pair_args.Path2)
+        except SystemExit:
+            logging.error(f"ERROR  Invalid path at line {line_num} of <{pairs_file}>:  {line.strip()}")
+            return None
+        remotes = {remote for remote in (path_remote(path1_base), path_remote(path2_base)) if remote is not None}
+        pairs.append((pair_args, "<{}>  ".format(pair_args.Path2), lock_file_name(path1_base, path2_base), remotes,
+                      (path1_base, path2_base)))
+    return pairs
+
+
+def run_pairs(pairs_file, parser):
+    """
+    Run the pairs of the pairs_file, each in a forked child process, with at most args.max_pairs at a time and
+    at most args.max_per_remote at a time using any one remote.  Pairs with the same lock file are not run at
+    the same time.  The environment checks and the rclone rcd (--rc) are done once, and shared by all the pairs.
+    With --shared-listing the remotes are listed by share_listings once for each round of pairs started together,
+    just before they start, so no pair syncs from a listing taken while it waited for its turn.
+    On a keyboard interrupt the running pairs abort as usual, and no more are started.
+    Returns the highest of the pair's exit codes.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        logging.error("ERROR  --pairs is not supported on this platform.  Run rclonesync once per pair.")
+        return 1
+    pending = load_pairs(pairs_file, parser)
+    if pending is None:
+        return 1
+    logging.info(f">>>>> Running {len(pending)} pairs from <{pairs_file}>")
+    context = multiprocessing.get_context('fork')
+    running = {}
+    statuses = []
+    interrupted = []
+    signal.signal(signal.SIGINT, lambda signum, frame: interrupted.append(signum))
+
+    while pending or running:
+        if interrupted and pending:
+            logging.error(f"***** KeyboardInterrupt - {len(pending)} pairs not started *****")
+            pending = []
+        starting = []
+        for pair in list(pending):
+            active = list(running.values()) + starting
+            if len(active) >= args.max_pairs:
+                break
+            _, _, pair_lock, remotes, _ = pair
+            busy = [active_pair for active_pair in active if active_pair[2] == pair_lock]
+            if busy or any(sum(1 for active_pair in active if remote in active_pair[3]) >= args.max_per_remote
+                           for remote in remotes):
+                continue
+            starting.append(pair)
+            pending.remove(pair)
+        if args.shared_listing and len(starting) > 1:
+            share_listings(starting)
+        for pair in starting:
+            process = context.Process(target=run_pair, args=pair[:2])
+            process.start()
+            running[process] = pair
+        if running:
+            multiprocessing.connection.wait([process.sentinel for process in running])
+        for process in list(running):
+            if process.exitcode is not None:
+                process.join()
+                pair_args, label, _, _, _ = running.pop(process)
+                status = process.exitcode if process.exitcode >= 0 else RTN_CRITICAL     # < 0 is killed by a signal
+                statuses.append(status)
+                if status:
+                    logging.warning(f"{label}***** Failed with exit code {status} *****")
+
+    if not args.no_cleanup:
+        for shared_file in shared_listings.values():       # Those of pairs that failed before listing
+            if os.path.exists(shared_file):
+                os.remove(shared_file)
+    return max(statuses, default=0)
+
+
+# ***** Shared remote listings, for --pairs --shared-listing *****
+shared_listings = {}                                # (lock file, path base): the path's lsl, cut from a shared listing
+
+def share_listings(pairs):
+    """
+    For each remote used by more than one of the pairs, which are about to be started, list the common root of the pairs' paths on the remote
+    once, and cut each pair's lsl out of it:  The lines under the pair's path, rebased to the path, less those
+    excluded by the pair's filters.  The cut lsl files are left in the workdir, noted in shared_listings, for the
+    pair's get_and_load_lsl to use in place of its rclone lsl of the path.
+    The lines are cut as text, keeping the lsl as rclone wrote it, so the pair's history is just as if it listed
+    the path itself, and are written as rclone_lsl streams them, without loading the root's listing.  A root that
+    is the whole remote is not listed, nor where the shared listing fails:  The pairs then list their own paths.
+    """
+    bases = collections.defaultdict(list)           # remote: [(lock file, path base, exclude function, cut file)]
+    for pair_args, _, pair_lock, _, (path1_base, path2_base) in pairs:
+        if pair_args.rclone_args is not None:
+            continue
+        excluded = lambda key: False
+        if pair_args.filters_file is not None:
+            excluded = exclude_filter(pair_args.filters_file)
+            if excluded is None:
+                continue
+        lsl_file_base = workdir + "LSL_" + (path1_base + path2_base).replace(':','_').replace(r'/','_').replace('\\','_')
+        for path_base, side in ((path1_base, "_Path1"), (path2_base, "_Path2")):
+            remote = path_remote(path_base)
+            if remote is not None and (pair_lock, path_base) not in [base[:2] for base in bases[remote]]:
+                bases[remote].append((pair_lock, path_base, excluded, lsl_file_base + side + "_SHARED"))
+
+    for remote, remote_bases in bases.items():
+        if len(remote_bases) < 2:
+            continue
+        root = os.path.commonprefix([path_base for _, path_base, _, _ in remote_bases])
+        root = root[:max(root.rfind('/'), root.find(':')) + 1]
+        if not root[len(remote):].strip('/'):
+            logging.info(print_msg("INFO", "No shared listing of a whole remote.  The pairs list their own paths.", root))
+            continue
+        root_file = workdir + "LSL_" + root.replace(':','_').replace(r'/','_').replace('\\','_') + "_SHARED"
+        logging.info(f">>>>> Listing <{root}> once for the {len(remote_bases)} paths under it")
+        status, _ = rclone_lsl(root, root_file, options=["--fast-list"],
+                               load=lambda lines, lslfile: cut_lines(lines, lslfile, root, remote_bases))
+        if status:
+            logging.warning(print_msg("WARNING", "Shared listing failed.  The pairs list their own paths.", root))
+            continue
+        for pair_lock, path_base, _, cut_file in remote_bases:
+            shared_listings[(pair_lock, path_base)] = cut_file
+        if not args.no_cleanup:
+            os.remove(root_file)
+
+
+def cut_lines(lines, lslfile, root, bases):
+    """
+    The rclone_lsl load for share_listings:  Write each of the lsl lines of the root to the cut file of each of
+    the (lock file, path base, exclude function, cut file) bases it is under, rebased to the path base.
+    Returns (status, None).
+    """
+    outs = []
+    try:
+        for _, path_base, excluded, cut_file in bases:
+            outs.append((path_base[len(root):], excluded, io.open(cut_file, mode='wt', encoding='utf8', newline='')))
+        for line in lines:
+            key = lsl_line_key(line)
+            if key is None:
+                continue
+            end = len(line) - 1 if line.endswith('\n') else len(line)
+            for prefix, excluded, of in outs:
+                if key.startswith(prefix) and not excluded(key[len(prefix):]):
+                    of.write(line[:end - len(key)] + key[len(prefix):] + '\n')
+        return 0, None
+    except Exception as e:
+        logging.error(f"Exception in cut_lines cutting <{lslfile}>:\n  <{e}>")
+        return 1, None
+    finally:
+        for _, _, of in outs:
+            of.close()
+
+
+def glob_regex(glob):
+    """
+    Return the regex for an rclone filter glob, as rclone's GlobToRegexp:  A leading '/' anchors the glob to the
+    root, else it matches at the end of any path.  '*' and '?' do not match '/', '**' does.  [...] classes and
+    {a,b} alternations are supported.  Raises ValueError for an invalid glob.
+    """
+    if glob.startswith('/'):
+        regex = '^'
+        glob = glob[1:]
+    else:
+        regex = '(^|/)'
+    in_braces = in_brackets = False
+    x = 0
+    while x < len(glob):
+        c = glob[x]
+        if in_brackets:
+            regex += c
+            in_brackets = c != ']'
+        elif c == '\\':
+            x += 1
+            if x == len(glob):
+                raise ValueError(f"Trailing escape in glob <{glob}>")
+            regex += re.escape(glob[x])
+        elif c == '*':
+            if glob[x+1:x+2] == '*':
+                regex += '.*'
+                x += 1
+            else:
+                regex += '[^/]*'
+        elif c == '?':
+            regex += '[^/]'
+        elif c == '[':
+            regex += '['
+            in_brackets = True
+        elif c == '{':
+            if in_braces:
+                raise ValueError(f"Nested braces in glob <{glob}>")
+            regex += '('
+            in_braces = True
+        elif c == '}' and in_braces:
+            regex += ')'
+            in_braces = False
+        elif c == ',' and in_braces:
+            regex += '|'
+        else:
+            regex += re.escape(c)
+        x += 1
+    if in_braces or in_brackets:
+        raise ValueError(f"Unclosed braces or brackets in glob <{glob}>")
+    return regex + '$'
+
+
+def exclude_rules(filter_file):
+    """
+    Return (file_match, dir_match) regex search functions for the exclude rules of the rclone filter_file, each
+    None if there are no such rules.  Returns None if the filter_file has rules other than exclude (-) rules, or
+    cannot be read.
+    With only exclude rules their order does not matter, and rclone excludes a file if a file rule matches its
+    path, or a directory rule matches any of its parent directories (as 'dir/').  Like rclone, an excluded 'dir/'
+    is taken as 'dir/**', globs with '**' are both file and directory rules, and '!' clears the rules so far.
+    """
+    file_rules = []
+    dir_rules = []
+    try:
+        with io.open(filter_file, mode='rt', encoding='utf8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line[0] in '#;':
+                    continue
+                if line == '!':
+                    file_rules, dir_rules = [], []
+                    continue
+                if not line.startswith('- '):
+                    return None
+                glob = line[2:]
+                if glob.endswith('/'):
+                    glob += '**'
+                regex = glob_regex(glob)
+                file_rules.append(regex)
+                if '**' in glob:
+                    dir_rules.append(regex)
+    except (OSError, ValueError) as e:
+        logging.info(print_msg("WARNING", f"Cannot apply the filters here:  {e}", filter_file))
+        return None
+    file_match = re.compile('|'.join(f'(?:{regex})' for regex in file_rules)).search if file_rules else None
+    dir_match = re.compile('|'.join(f'(?:{regex})' for regex in dir_rules)).search if dir_rules else None
+    return file_match, dir_match
+
+
+def exclude_filter(filter_file):
+    """Return a function telling if a file key is excluded by the rclone filter_file, or None as exclude_rules."""
+    rules = exclude_rules(filter_file)
+    if rules is None:
+        return None
+    file_match, dir_match = rules
+
+    def excluded(key):
+        if file_match is not None and file_match(key):
+            return True
+        if dir_match is not None:
+            x = key.find('/')
+            while x >= 0:
+                if dir_match(key[:x+1]):
+                    return True
+                x = key.find('/', x + 1)
+        return False
+    return excluded
+
+
+def run_pair(pair_args, label):
+    """The child process of a --pairs run:  Sync one pair, as if run by itself."""
+    global rc_local, workdir
+    rc_local = threading.local()                    # Not the parent's connection to the rcd
+    signal.signal(signal.SIGINT, keyboardInterruptHandler)
+    set_args(pair_args)
+    set_up_logging(label)
+    workdir = check_workdir(args.workdir)
+    sys.exit(sync_pair(args.Path1, args.Path2))
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="***** BiDirectional Sync for Cloud Services using rclone *****")
-    parser.add_argument('Path1',
+    parser.add_argument('Path1', nargs='?',
                         help="Local path, or cloud service with ':' plus optional path.  Type 'rclone listremotes' for list of configured remotes.")
-    parser.add_argument('Path2',
+    parser.add_argument('Path2', nargs='?',
                         help="Local path, or cloud service with ':' plus optional path.  Type 'rclone listremotes' for list of configured remotes.")
     parser.add_argument('-1', '--first-sync', action='store_true',
                         help="First run setup.  WARNING: Path1 files may overwrite path2 versions.  Consider using with --dry-run first.  Also asserts --verbose.")
@@ -745,6 +2995,44 @@ if __name__ == '__main__':
                         help="Path to rclone executable (default is rclone in path environment var).")
     parser.add_argument('--config', default=None,
                         help="Path to rclone config file (default is typically ~/.config/rclone/rclone.conf).")
+    parser.add_argument('--workers', type=positive_int, default=4,
+                        help="Maximum number of concurrent rclone copy/delete batches (default 4).")
+    parser.add_argument('--shard-files', type=positive_int, default=10000,
+                        help="Copy/delete batches of more files than this are split into size balanced shards, run concurrently within --workers (default 10000).")
+    parser.add_argument('--compare', choices=['modtime', 'size', 'hash'], default='modtime',
+                        help="How changes since the prior sync are found:  by modtime (default), by size also (a changed size with an unchanged modtime), or by hash, as size plus a changed file is not copied where the other path's file has the same MD5 hash, eg it was only touched.  Hashes are cached in the workdir, so unchanged files are not rehashed.")
+    parser.add_argument('--detect-renames', action='store_true',
+                        help="Pair the files deleted and new on a path by their size and modtime (and MD5 hash with --compare hash) as renamed or moved, and move them on the other path rather than copy and delete them.  Files without a unique match are copied and deleted as usual.")
+    parser.add_argument('--pairs', default=None,
+                        help="File of Path1 Path2 pairs, each optionally followed by switches for the pair, to sync concurrently in place of the Path1 Path2 arguments.  The other switches apply to all the pairs, except --watch which is not supported with --pairs.  See --max-pairs and --max-per-remote.")
+    parser.add_argument('--max-pairs', type=positive_int, default=4,
+                        help="Maximum number of --pairs synced concurrently (default 4).")
+    parser.add_argument('--max-per-remote', type=positive_int, default=2,
+                        help="Maximum number of --pairs synced concurrently on any one remote, eg to stay within a cloud service's rate limits (default 2).")
+    parser.add_argument('--shared-listing', action='store_true',
+                        help="For --pairs on the same remote, list their common root on the remote once (with --fast-list) and cut each pair's listing from it, rather than an rclone lsl per pair.  Pairs with --rclone-args, or with filters other than exclude (-) rules, list their own, as do pairs whose common root is the whole remote.  Only the pairs started together share a listing, so it is taken just before they start:  See --max-pairs and --max-per-remote.")
+    parser.add_argument('--lsjson', action='store_true',
+                        help="List the paths by rclone lsjson -R --fast-list rather than rclone lsl, for far fewer list calls on remotes such as Google Drive.  With --compare hash, the remote's MD5 hashes are listed with the files.")
+    parser.add_argument('--native-local', action='store_true',
+                        help="List local paths here, with a parallel directory scan, rather than by rclone lsl.  Paths with --rclone-args, or with filters other than exclude (-) rules, are listed by rclone.")
+    parser.add_argument('--dir-cache', action='store_true',
+                        help="Keep a cache of the local paths' directories in the workdir, and rescan only directories with a changed mtime.  Asserts --native-local.  See --dir-cache-rescan.")
+    parser.add_argument('--dir-cache-rescan', type=int, default=20,
+                        help="With --dir-cache, do a full scan every this many runs, to pick up files modified in place (default 20).")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running, watching the local Path1 for changes (Linux only), and sync the changed files on both paths after each burst of changes.  Not with --pairs.  See --watch-debounce and --watch-full-interval.")
+    parser.add_argument('--watch-debounce', type=float, default=2,
+                        help="With --watch, sync once Path1 has had no changes for this many seconds (default 2).")
+    parser.add_argument('--watch-full-interval', type=float, default=3600,
+                        help="With --watch, run a full sync of both paths every this many seconds, to pick up the Path2 changes (default 3600).")
+    parser.add_argument('--rc', action='store_true',
+                        help=f"Run the rclone operations thru one rclone rcd (remote control daemon) started for this run, rather than an rclone process per operation (rclone v{RC_MIN_VERSION}+).")
+    parser.add_argument('--rc-addr', default=None,
+                        help="As --rc, but attach to the already running rclone rcd at this address, eg localhost:5572.  Credentials are taken from the RCLONE_RC_USER and RCLONE_RC_PASS environment variables.")
+    parser.add_argument('--metrics-file', default=None,
+                        help="Write a JSON report of the run to this file:  The wall time of each phase, the rclone calls by command and calling line with their wall time, retries and files listed, the files and bytes transferred, and the peak memory.  With --pairs, each pair's file is named with its paths appended.")
+    parser.add_argument('--metrics-textfile', default=None,
+                        help="Write the run's metrics, as for --metrics-file, to this file in the Prometheus text format, for the node exporter textfile collector.  Name it *.prom.")
     parser.add_argument('--rclone-args', nargs=argparse.REMAINDER,
                         help="Optional argument(s) to be passed to rclone.  Specify this switch and rclone ags at the end of rclonesync command line.")
     parser.add_argument('-v', '--verbose', action='count', default=0,
@@ -762,33 +3050,12 @@ if __name__ == '__main__':
     parser.add_argument('-V', '--version', action='version', version='%(prog)s ' + __version__,
                         help="Return rclonesync's version number and exit.")
     args = parser.parse_args()
-    
-    first_sync   =  args.first_sync
-    check_access =  args.check_access
-    chk_file     =  args.check_filename
-    max_deletes  =  args.max_deletes
-    verbose      =  args.verbose
-    rc_verbose   =  args.rc_verbose
-    if rc_verbose == None: rc_verbose = 0
-    user_filter_file =  args.filters_file
-    rclone       =  args.rclone
-    dry_run      =  args.dry_run
-    force        =  args.force
-    rmdirs       =  args.remove_empty_directories
-
-
-    # Set up logging
-    if not args.no_datetime_log:
-        logging.basicConfig(format='%(asctime)s:  %(message)s') # /%(levelname)s/%(module)s/%(funcName)s
-    else:
-        logging.basicConfig(format='%(message)s')
-
-    if verbose >= 2:
-        logging.getLogger().setLevel(logging.DEBUG)             # Log debug detail
-    elif verbose>0 or rc_verbose>0 or force or first_sync or dry_run:
-        logging.getLogger().setLevel(logging.INFO)              # Log each file transaction
-    else:
-        logging.getLogger().setLevel(logging.WARNING)           # Log only unusual events.  Normally silent.
+    if args.pairs is None and args.Path2 is None:
+        parser.error("the Path1 and Path2 arguments are required, unless --pairs")
+    if args.pairs is not None and args.watch:
+        parser.error("--watch is for a single Path1 Path2 pair, not --pairs")
+    set_args(args)
+    set_up_logging()
 
     logging.info(f"***** BiDirectional Sync for Cloud Services using rclone ({__version__}) *****")
 
@@ -811,15 +3078,7 @@ if __name__ == '__main__':
 
 
     # Check workdir goodness
-    workdir = args.workdir
-    if not (workdir.endswith('/') or workdir.endswith('\\')):   # 2nd check is for Windows paths
-        workdir += '/'
-    try:
-        if not os.path.exists(workdir):
-            os.makedirs(workdir)
-    except Exception as e:
-        logging.error(f"ERROR  Cannot access workdir at <{workdir}>.")
-        sys.exit(1)
+    workdir = check_workdir(args.workdir)
 
 
     # Check rclone related goodness
@@ -859,77 +3118,17 @@ if __name__ == '__main__':
         sys.exit(1)
 
 
-    # Set up Path1 / Path2
-    def pathparse(path):
-        """Handle variations in a path argument.
-        Cloud:              - Root of the defined cloud
-        Cloud:some/path     - Supported with our without path leading '/'s
-        X:                  - Windows drive letter
-        X:\\some\\path      - Windows drive letter with absolute or relative path
-        some/path           - Relative path from cwd (and on current drive on Windows)
-        //server/path       - UNC paths are supported
-        On Windows a one-character cloud name is not supported - it will be interprested as a drive letter.
-        """
-        _cloud = False
-        path_base = ''
-        if ':' in path:
-            if len(path) == 1:                                  # Handle corner case of ':' only passed in
-                logging.error("ERROR  Path argument <{}> not a legal path.".format(path))
-                sys.exit(1)
-            if path[1] == ':' and is_Windows:                   # Windows drive letter case
-                path_base = path
-                if not path_base.endswith('\\'):                # For consistency ensure the path ends with '/'
-                    path_base += '/'
-            else:                                               # Cloud case with optional path part
-                # path_FORMAT = re.compile(r'([\w-]+):(.*)')
-                path_FORMAT = re.compile(r'([ \w-]+):(.*)')
-                out = path_FORMAT.match(path)
-                if out:
-                    _cloud = True
-                    cloud_name = out.group(1) + ':'
-                    if cloud_name not in clouds:
-                        logging.error(f"ERROR  Path argument <{cloud_name}> not in list of configured Clouds: {clouds}.")
-                        sys.exit(1)
-                    path_part = out.group(2)
-                    if path_part:
-                        if not (path_part.endswith('/') or path_part.endswith('\\')):    # 2nd check is for Windows paths
-                            path_part += '/'
-                    path_base = cloud_name + path_part
-        else:                                                   # Local path (without Windows drive letter)
-            path_base = path
-            if not (path_base.endswith('/') or path_base.endswith('\\')):
-                path_base += '/'
-
-        if not _cloud:
-            if not os.path.exists(path_base):
-                logging.error(f"ERROR  Local path parameter <{path_base}> cannot be accessed.  Path error?")
-                sys.exit(1)
-
-        return path_base
+    if args.rc or args.rc_addr is not None:
+        if rcversion < RC_MIN_VERSION:
+            logging.error(f"ERROR  --rc and --rc-addr need rclone v{RC_MIN_VERSION} or later.  Found version v{rcversion}.")
+            sys.exit(1)
+        if rc_start():
+            sys.exit(1)
 
-    path1_base = pathparse(args.Path1)
-    path2_base = pathparse(args.Path2)
 
     # Run the job
-    lock_file = os.path.join(tempfile.gettempdir(), 'rclonesync_LOCK_' + (
-        path1_base + path2_base).replace(':','_').replace(r'/','_').replace('\\','_'))
-
-    if request_lock(sys.argv, lock_file) == 0:
-        status = bidirSync()
-        release_lock(lock_file)
-        if status == RTN_CRITICAL:
-            logging.error("***** Critical Error Abort - Must run --first-sync to recover.  See README.md *****\n")
-            if os.path.exists(path2_lsl_file):
-                shutil.move(path2_lsl_file, path2_lsl_file + '_ERROR')
-            if os.path.exists(path1_lsl_file):
-                shutil.move(path1_lsl_file, path1_lsl_file + '_ERROR')
-            sys.exit(2)
-        if status == RTN_ABORT:
-            logging.error("***** Error Abort.  Try running rclonesync again. *****\n")
-            sys.exit(1)
-        if status == 0:
-            logging.info(">>>>> Successful run.  All done.\n")
-            sys.exit(0)
-    else:
-        logging.warning("***** Prior lock file in place, aborting.  Try running rclonesync again. *****\n")
-        sys.exit(1)
+    if args.pairs is not None:
+        sys.exit(run_pairs(args.pairs, parser))
+    if args.watch:
+        sys.exit(watch_pair(args.Path1, args.Path2))
+    sys.exit(sync_pair(args.Path1, args.Path2))
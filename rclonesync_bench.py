@@ -0,0 +1,753 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for rclonesync internals"""
+
+#==========================================================================================================
+# Run from the directory containing rclonesync.py, eg:
+#   python3 rclonesync_bench.py load_list --entries 1000000
+#   python3 rclonesync_bench.py listing --entries 1000000
+#   python3 rclonesync_bench.py snapshot --entries 1000000
+#   python3 rclonesync_bench.py deltas --entries 1000000
+#   python3 rclonesync_bench.py lsjson --entries 1000000
+#   python3 rclonesync_bench.py local --entries 100000 --rclone /usr/bin/rclone
+#   python3 rclonesync_bench.py scale --sizes 10000,100000,1000000,10000000 --rates new=0.02,deleted=0.01
+#   python3 rclonesync_bench.py e2e --entries 5000 --json base.json
+#   python3 rclonesync_bench.py e2e --entries 5000 --baseline base.json --rclonesync-args --workers 8
+#
+# Each benchmark checks that the current implementation returns the same results as the reference
+# (pre-optimization) implementation kept here, then reports the throughput or memory use of both.
+# The local benchmark checks the native local lister against the output of rclone lsl itself.
+# The scale benchmark runs rclonesync.py end to end against a stub rclone serving synthetic listings.
+# The e2e benchmark runs rclonesync.py scenarios between local trees, thru rclone with injected cloud latency.
+#==========================================================================================================
+
+import argparse
+import sys
+import os.path
+import io
+import re
+import random
+import tempfile
+import time
+import logging
+import collections
+import tracemalloc
+import subprocess
+import json
+import resource
+import shutil
+import traceback
+from datetime import datetime
+
+import rclonesync
+
+
+# ***** Reference implementations, as before optimization *****
+LINE_FORMAT = re.compile(r'\s*([0-9]+) ([\d\-]+) ([\d:]+).([\d]+) (.*)')
+def legacy_load_list(lslfile):
+    d = {}
+    try:
+        line = "<none>"
+        line_cnt = 0
+        with io.open(lslfile, mode='rt', encoding='utf8') as f:
+            for line in f:
+                line_cnt += 1
+                out = LINE_FORMAT.match(line)
+                if out:
+                    size = out.group(1)
+                    date = out.group(2)
+                    _time = out.group(3)
+                    microsec = out.group(4)
+                    date_time = time.mktime(datetime.strptime(date + ' ' + _time, '%Y-%m-%d %H:%M:%S').timetuple()) + float('.'+ microsec)
+                    filename = out.group(5)
+                    if filename in d:
+                        if date_time > d[filename]['datetime']:
+                            d[filename] = {'size': size, 'datetime': date_time}
+                    else:
+                        d[filename] = {'size': size, 'datetime': date_time}
+        return 0, collections.OrderedDict(sorted(d.items()))
+    except Exception:
+        return 1, ""
+
+
+# ***** Synthetic rclone lsl output *****
+def synth_lsl(ofile, entries, seed=1):
+    """
+    Write entries lines of rclone lsl style output to ofile.
+    Modtimes cluster the way real trees do (files written together within a few minutes of each other), with a
+    sprinkling of whole-second (zero fraction) times as from backends with 1 sec precision.
+    """
+    rnd = random.Random(seed)
+    dirs = ["dir{:04}/sub{:02}".format(d, rnd.randrange(20)) for d in range(max(1, entries // 200))]
+    base = time.mktime((2015, 1, 1, 0, 0, 0, 0, 0, -1))
+    sessions = [base + rnd.randrange(6 * 365 * 86400) for _ in range(max(1, entries // 50))]
+    with io.open(ofile, mode='wt', encoding='utf8') as of:
+        for x in range(entries):
+            epoch = rnd.choice(sessions) + rnd.randrange(600)
+            frac = "000000000" if rnd.random() < 0.2 else "{:09}".format(rnd.randrange(10**9))
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(epoch)) + "." + frac
+            of.write("{:9} {} {}/file {:07}.dat\n".format(rnd.randrange(10**8), stamp, rnd.choice(dirs), x))
+
+
+def same_listing(legacy, current):
+    """Compare a reference (status, OrderedDict) load_list result with a current (status, Listing) result."""
+    if legacy[0] != current[0]:
+        return False
+    return [(key, int(value['size']), value['datetime']) for key, value in legacy[1].items()] == list(current[1].items())
+
+
+def traced(func, *fargs):
+    """Return (peak, retained) bytes allocated by func, per tracemalloc, and func's result."""
+    tracemalloc.start()
+    result = func(*fargs)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, retained, result
+
+
+def timed(func, *fargs):
+    start = time.perf_counter()
+    result = func(*fargs)
+    return time.perf_counter() - start, result
+
+
+def bench_load_list(entries, repeat):
+    """Compare load_list lines/sec versus the reference regex + strptime + mktime implementation."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lslfile = os.path.join(tmpdir, "LSL_bench")
+        synth_lsl(lslfile, entries)
+
+        legacy_best = current_best = None
+        for _ in range(repeat):
+            rclonesync.LSL_MINUTES.clear()              # Each timed run starts with a cold memo
+            legacy_time, legacy = timed(legacy_load_list, lslfile)
+            current_time, current = timed(rclonesync.load_list, lslfile)
+            legacy_best = legacy_time if legacy_best is None else min(legacy_best, legacy_time)
+            current_best = current_time if current_best is None else min(current_best, current_time)
+
+        if not same_listing(legacy, current):
+            print("ERROR  load_list results differ from the reference implementation")
+            return 1
+        print(f"load_list  {entries} lines, best of {repeat}:")
+        print(f"  reference  {legacy_best:8.3f} sec  {entries/legacy_best:12,.0f} lines/sec")
+        print(f"  current    {current_best:8.3f} sec  {entries/current_best:12,.0f} lines/sec  ({legacy_best/current_best:.1f}x)")
+    return 0
+
+
+def bench_listing(entries):
+    """Compare the memory held by the load_list result versus the reference OrderedDict of dictionaries."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lslfile = os.path.join(tmpdir, "LSL_bench")
+        synth_lsl(lslfile, entries)
+        legacy_peak, legacy_retained, legacy = traced(legacy_load_list, lslfile)
+        legacy_size = os.path.getsize(lslfile)
+        current_peak, current_retained, current = traced(rclonesync.load_list, lslfile)
+
+        if not same_listing(legacy, current):
+            print("ERROR  load_list results differ from the reference implementation")
+            return 1
+        MB = 1024 * 1024
+        print(f"listing  {entries} entries, {legacy_size/MB:.1f} MB lsl file:")
+        print(f"  reference  {legacy_retained/MB:8.1f} MB retained  {legacy_peak/MB:8.1f} MB peak  {legacy_retained/entries:6.0f} bytes/entry")
+        print(f"  current    {current_retained/MB:8.1f} MB retained  {current_peak/MB:8.1f} MB peak  {current_retained/entries:6.0f} bytes/entry"
+              f"  ({legacy_retained/current_retained:.1f}x less retained, {legacy_peak/current_peak:.1f}x less peak)")
+    return 0
+
+
+def bench_snapshot(entries):
+    """Compare loading a prior listing from its binary snapshot versus parsing the text lsl file."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lslfile = os.path.join(tmpdir, "LSL_bench")
+        synth_lsl(lslfile, entries)
+        text_time, (_, text) = timed(rclonesync.load_list, lslfile)
+        save_time, _ = timed(rclonesync.save_snapshot, text, lslfile)
+        snapshot_time, snapshot = timed(rclonesync.load_snapshot, lslfile)
+
+        if snapshot is None or list(text.items()) != list(snapshot.items()):
+            print("ERROR  Snapshot listing differs from the lsl file listing")
+            return 1
+        print(f"snapshot  {entries} entries:")
+        print(f"  load_list      {text_time:8.3f} sec")
+        print(f"  save_snapshot  {save_time:8.3f} sec")
+        print(f"  load_snapshot  {snapshot_time:8.3f} sec  ({text_time/snapshot_time:,.0f}x)")
+        snapshot = None
+    return 0
+
+
+def synth_dir_changes(prior_file, now_file, dirs, seed=1):
+    """
+    Write now_file as the prior_file listing changed in only the dirs directories, as in a largely static archive:
+    Of their files 10% are newer and 5% deleted, and each gets 10 new files.
+    """
+    rnd = random.Random(seed)
+    with io.open(prior_file, mode='rt', encoding='utf8') as f:
+        lines = f.readlines()
+    names = sorted({line.lstrip().split(" ", 3)[3].rsplit("/", 1)[0] for line in lines})
+    changed = set(rnd.sample(names, min(dirs, len(names))))
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+    with io.open(now_file, mode='wt', encoding='utf8') as of:
+        for line in lines:
+            if line.lstrip().split(" ", 3)[3].rsplit("/", 1)[0] in changed:
+                pick = rnd.random()
+                if pick < 0.05:
+                    continue
+                if pick < 0.15:
+                    line = shifted(line, 3600)
+            of.write(line)
+        for name in sorted(changed):
+            for x in range(10):
+                of.write("{:9} {}.{:09} {}/new {:02}.dat\n".format(rnd.randrange(10**8), stamp, rnd.randrange(10**9), name, x))
+
+
+def bench_deltas(entries, repeat):
+    """
+    Compare get_deltas' top-down subtree_deltas, with the prior listing from its snapshot as in a run, versus the
+    reference listing_deltas walk of every key.  Changes in a few directories, as for a largely static archive,
+    and changes spread across the tree, per the scale benchmark's CHANGE_RATES.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prior_file = os.path.join(tmpdir, "LSL_prior")
+        now_file = os.path.join(tmpdir, "LSL_now")
+        spread_file = os.path.join(tmpdir, "LSL_spread")
+        synth_changes(prior_file, spread_file, os.path.join(tmpdir, "LSL_spread2"), entries, CHANGE_RATES)
+        synth_dir_changes(prior_file, now_file, 5)
+        _, prior = rclonesync.load_list(prior_file)
+        rclonesync.save_snapshot(prior, prior_file)
+        prior = rclonesync.load_snapshot(prior_file)
+
+        print(f"deltas  {entries} entries, best of {repeat}:")
+        for name, lsl_file in (("5 directories changed", now_file), ("changes spread", spread_file)):
+            _, now = rclonesync.load_list(lsl_file)
+            legacy_best = current_best = None
+            for _ in range(repeat):
+                legacy_time, legacy = timed(lambda: list(rclonesync.listing_deltas(prior.items(), now.items())))
+                current_time, current = timed(lambda: list(rclonesync.subtree_deltas(prior, now)))
+                legacy_best = legacy_time if legacy_best is None else min(legacy_best, legacy_time)
+                current_best = current_time if current_best is None else min(current_best, current_time)
+            if legacy != current:
+                print("ERROR  subtree_deltas results differ from listing_deltas")
+                return 1
+            print(f"  {name}, {len(current)} changes:")
+            print(f"    listing_deltas  {legacy_best:8.3f} sec")
+            print(f"    subtree_deltas  {current_best:8.3f} sec  ({legacy_best/current_best:.1f}x)")
+        prior = None
+    return 0
+
+
+def synth_lsjson(lslfile, jsonfile):
+    """Write the rclone lsl lines of lslfile to jsonfile as rclone lsjson output, with UTC ModTimes, as from a remote."""
+    with io.open(lslfile, mode='rt', encoding='utf8') as f, io.open(jsonfile, mode='wt', encoding='utf8') as of:
+        of.write("[\n")
+        for x, line in enumerate(f):
+            size, date, clock, key = line.lstrip().rstrip("\n").split(" ", 3)
+            epoch = time.mktime(time.strptime(date + " " + clock[:8], "%Y-%m-%d %H:%M:%S"))
+            frac = clock[9:].rstrip("0")
+            modtime = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch)) + ("." + frac if frac else "") + "Z"
+            item = {"Path": key, "Name": os.path.basename(key), "Size": int(size), "MimeType": "application/octet-stream",
+                    "ModTime": modtime, "IsDir": False}
+            of.write((",\n" if x else "") + json.dumps(item))
+        of.write("\n]\n")
+
+
+def bench_lsjson(entries, repeat):
+    """Compare loading rclone lsjson output, by the streaming JSON parser, versus loading the same listing as lsl lines."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lslfile = os.path.join(tmpdir, "LSL_bench")
+        jsonfile = os.path.join(tmpdir, "LSJSON_bench")
+        synth_lsl(lslfile, entries)
+        synth_lsjson(lslfile, jsonfile)
+
+        def load_lsjson():
+            with io.open(jsonfile, mode='rt', encoding='utf8') as f:
+                return rclonesync.load_lines(rclonesync.lsjson_lines(f, {}), jsonfile)
+
+        lsl_best = json_best = None
+        for _ in range(repeat):
+            lsl_time, reference = timed(rclonesync.load_list, lslfile)
+            json_time, current = timed(load_lsjson)
+            lsl_best = lsl_time if lsl_best is None else min(lsl_best, lsl_time)
+            json_best = json_time if json_best is None else min(json_best, json_time)
+
+        if reference[0] or current[0] or list(reference[1].items()) != list(current[1].items()):
+            print("ERROR  lsjson listing differs from the lsl listing")
+            return 1
+        print(f"lsjson  {entries} entries, best of {repeat}:")
+        print(f"  lsl lines  {lsl_best:8.3f} sec  {entries/lsl_best:12,.0f} entries/sec")
+        print(f"  lsjson     {json_best:8.3f} sec  {entries/json_best:12,.0f} entries/sec")
+    return 0
+
+
+# ***** Scale benchmark:  synthetic changes, a stub rclone, and per-phase time and peak RSS *****
+CHANGE_RATES = {'new': 0.01, 'newer': 0.01, 'older': 0.001, 'deleted': 0.01, 'conflicts': 0.001}
+
+def parse_rates(text):
+    """Parse eg 'new=0.01,deleted=0.02' into a copy of CHANGE_RATES with those rates replaced."""
+    rates = dict(CHANGE_RATES)
+    for item in filter(None, text.split(',')):
+        name, rate = item.split('=')
+        if name not in rates:
+            raise argparse.ArgumentTypeError(f"Unknown change rate <{name}>, expected one of {', '.join(rates)}")
+        rates[name] = float(rate)
+    return rates
+
+
+def shifted(line, seconds, size=None):
+    """Return the lsl line with its modtime moved by seconds, and optionally a new size."""
+    old_size, date, clock, key = line.lstrip().split(" ", 3)
+    epoch = time.mktime(time.strptime(date + " " + clock[:8], "%Y-%m-%d %H:%M:%S")) + seconds
+    return "{:9} {}{} {}".format(size if size is not None else int(old_size),
+                                 time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(epoch)), clock[8:], key)
+
+
+def synth_changes(prior_file, path1_file, path2_file, entries, rates, seed=1):
+    """
+    Write the current Path1 and Path2 lsl files as changed from the prior_file listing of entries, per the rates, as
+    fractions of the entries:  new, newer, older and deleted on each path independently, and conflicts changed on
+    both.  The files are written line by line, so the generator holds no listing.
+    """
+    rnd = random.Random(seed)
+    synth_lsl(prior_file, entries, seed)
+    changes = (('newer', rates['newer']), ('older', rates['older']), ('deleted', rates['deleted']))
+
+    def change(line):
+        pick = rnd.random()
+        for name, rate in changes:
+            if pick < rate:
+                if name == 'deleted':
+                    return None
+                return shifted(line, 3600 if name == 'newer' else -3600)
+            pick -= rate
+        return line
+
+    with io.open(prior_file, mode='rt', encoding='utf8') as f, \
+         io.open(path1_file, mode='wt', encoding='utf8') as of1, io.open(path2_file, mode='wt', encoding='utf8') as of2:
+        for line in f:
+            if rnd.random() < rates['conflicts']:
+                of1.write(shifted(line, 3600, rnd.randrange(10**8)))
+                of2.write(shifted(line, 7200, rnd.randrange(10**8)))
+                continue
+            for of in (of1, of2):
+                line_now = change(line)
+                if line_now is not None:
+                    of.write(line_now)
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        for path, of in ((1, of1), (2, of2)):
+            for x in range(int(entries * rates['new'])):
+                of.write("{:9} {}.{:09} new{}/file {:07}.dat\n".format(rnd.randrange(10**8), stamp, rnd.randrange(10**9), path, x))
+
+
+STUB_RCLONE = """#!{python}
+# rclone stand-in written by rclonesync_bench.py:  Serves lsl listings from files, per the remote name, and records
+# the commands run.  Copies etc. only succeed.  A --files-from-raw lsl finds each file on its own remote's listing,
+# else on the other remote's (as just copied), else as the <key> of a <key>_Path1 or <key>_Path2 conflict rename.
+import json, os, sys
+config = json.load(open(os.environ["RCLONESYNC_BENCH_STUB"]))
+argv = sys.argv[1:]
+with open(config["log"], "a") as f:
+    f.write(json.dumps(argv) + "\\n")
+cmd = argv[0]
+if cmd == "version":
+    print("rclone v1.60.0")
+elif cmd == "listremotes":
+    print("".join(remote + ":\\n" for remote in config["listings"]))
+elif cmd == "lsl":
+    remote = argv[1].split(":")[0]
+    listings = [config["listings"][remote]] + [file for name, file in config["listings"].items() if name != remote]
+    if "--files-from-raw" not in argv:
+        with open(listings[0], "rb") as f:
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                sys.stdout.buffer.write(chunk)
+        sys.exit(0)
+    wanted = {{}}
+    with open(argv[argv.index("--files-from-raw") + 1], encoding="utf8") as f:
+        for key in f.read().splitlines():
+            wanted.setdefault(key, []).append(key)
+            if key.endswith("_Path1") or key.endswith("_Path2"):
+                wanted.setdefault(key[:-6], []).append(key)
+    found = set()
+    for file in listings:
+        with open(file, encoding="utf8") as f:
+            for line in f:
+                key = line.lstrip().split(" ", 3)[3][:-1]
+                head = line[:len(line) - len(key) - 1]
+                for listed in wanted.get(key, ()):
+                    if listed not in found:
+                        found.add(listed)
+                        sys.stdout.write(head + listed + "\\n")
+"""
+
+def stub_rclone(tmpdir, listings):
+    """Write the stub rclone to tmpdir, serving the listings {remote name: lsl file}.  Returns (stub, env, log)."""
+    stub = os.path.join(tmpdir, "rclone")
+    log = os.path.join(tmpdir, "rclone_commands")
+    config = os.path.join(tmpdir, "rclone_stub.json")
+    with open(stub, 'w') as f:
+        f.write(STUB_RCLONE.format(python=sys.executable))
+    os.chmod(stub, 0o755)
+    with open(config, 'w') as f:
+        json.dump({"listings": listings, "log": log}, f)
+    return stub, dict(os.environ, RCLONESYNC_BENCH_STUB=config), log
+
+
+def in_child(func, *fargs):
+    """
+    Run func in a forked child process, and return (seconds, peak RSS bytes) for it.  func returns the seconds of
+    its timed part, so its set up is not counted, though its memory is in the peak RSS.
+    An exception in func is passed back and raised here as a RuntimeError, with the child's traceback.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            os.close(read_fd)
+            try:
+                seconds = func(*fargs)
+                peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+                result = {"result": (seconds, peak)}
+            except BaseException:
+                result = {"error": traceback.format_exc()}
+            with os.fdopen(write_fd, 'w') as f:
+                f.write(json.dumps(result))
+            code = 0
+        finally:
+            os._exit(code)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result = f.read()
+    os.waitpid(pid, 0)
+    if not result:
+        raise RuntimeError(f"Benchmark child for {func.__name__} exited without a result")
+    result = json.loads(result)
+    if "error" in result:
+        raise RuntimeError(f"Benchmark child for {func.__name__} failed:\n{result['error']}")
+    return result["result"]
+
+
+def run_rclonesync(rclonesync_args, env):
+    """Run rclonesync.py with the args, and return (exit code, seconds, peak RSS bytes, stderr) for it."""
+    start = time.perf_counter()
+    p = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(rclonesync.__file__)), "rclonesync.py")]
+                         + rclonesync_args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    error = p.stderr.read().decode()
+    p.stderr.close()
+    _, status, usage = os.wait4(p.pid, 0)
+    seconds = time.perf_counter() - start
+    return os.waitstatus_to_exitcode(status), seconds, usage.ru_maxrss * 1024, error
+
+
+def bench_scale(sizes, rates, extra_args):
+    """
+    Time load_list, get_deltas, check_sync and a full rclonesync run (after a --first-sync) on synthetic listings
+    of each of the sizes, with the rates of changes, reporting the time and peak RSS of each, and the rclone
+    commands of the run.  rclone is the stub rclone, so only rclonesync's own overhead is measured.
+    """
+    rclonesync.args = argparse.Namespace(compare='modtime', workers=4)
+    MB = 1024 * 1024
+    for entries in sizes:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prior_file = os.path.join(tmpdir, "LSL_prior")
+            path1_file = os.path.join(tmpdir, "LSL_path1")
+            path2_file = os.path.join(tmpdir, "LSL_path2")
+            synth_changes(prior_file, path1_file, path2_file, entries, rates)
+
+            def load():
+                start = time.perf_counter()
+                rclonesync.load_list(path1_file)
+                return time.perf_counter() - start
+
+            def deltas():
+                _, prior = rclonesync.load_list(prior_file)
+                _, now = rclonesync.load_list(path1_file)
+                start = time.perf_counter()
+                rclonesync.get_deltas("Path1", prior, now)
+                return time.perf_counter() - start
+
+            def check():
+                _, path1 = rclonesync.load_list(path1_file)
+                _, path2 = rclonesync.load_list(path1_file)         # As after a successful sync, the same files
+                start = time.perf_counter()
+                rclonesync.check_sync(path1, path2)
+                return time.perf_counter() - start
+
+            print(f"scale  {entries} entries, rates " + ", ".join(f"{name} {rate:.2%}" for name, rate in rates.items()) + ":")
+            for name, func in (("load_list", load), ("get_deltas", deltas), ("check_sync", check)):
+                seconds, peak = in_child(func)
+                print(f"  {name:12} {seconds:8.3f} sec  {peak/MB:8.1f} MB peak RSS")
+
+            workdir = os.path.join(tmpdir, "workdir")
+            os.mkdir(workdir)
+            open(os.path.join(tmpdir, "rclone.conf"), 'w').close()
+            common = ["bench1:tree", "bench2:tree", "--workdir", workdir, "--config", os.path.join(tmpdir, "rclone.conf")]
+            stub, env, log = stub_rclone(tmpdir, {"bench1": prior_file, "bench2": prior_file})
+            status, seconds, peak, error = run_rclonesync(common + ["--first-sync", "--rclone", stub] + extra_args, env)
+            if status:
+                print(error + f"ERROR  rclonesync --first-sync failed with exit code {status}")
+                return 1
+            print(f"  {'first-sync':12} {seconds:8.3f} sec  {peak/MB:8.1f} MB peak RSS")
+            os.remove(log)
+            stub, env, log = stub_rclone(tmpdir, {"bench1": path1_file, "bench2": path2_file})
+            status, seconds, peak, error = run_rclonesync(common + ["--rclone", stub] + extra_args, env)
+            if status:
+                print(error + f"ERROR  rclonesync failed with exit code {status}")
+                return 1
+            with open(log, encoding='utf8') as f:
+                commands = collections.Counter(json.loads(line)[0] for line in f)
+            print(f"  {'bidirSync':12} {seconds:8.3f} sec  {peak/MB:8.1f} MB peak RSS  rclone commands:  "
+                  + ", ".join(f"{cmd} {count}" for cmd, count in sorted(commands.items())))
+    return 0
+
+
+# ***** End to end benchmark:  real rclonesync passes between local trees, thru a latency injecting rclone wrapper *****
+LATENCY_RCLONE = """#!{python}
+# rclone wrapper written by rclonesync_bench.py:  Records each command, sleeps as a cloud service's latency and
+# bandwidth would delay it, then runs the real rclone.
+import json, os, sys, time
+config = json.load(open(os.environ["RCLONESYNC_BENCH_WRAPPER"]))
+argv = sys.argv[1:]
+with open(config["log"], "a") as f:
+    f.write(json.dumps(argv) + "\\n")
+VALUE_SWITCHES = ("--config", "--filter-from", "--files-from-raw", "--log-format", "--min-size", "--hash-type")
+paths = [arg for x, arg in enumerate(argv[1:]) if not arg.startswith("-") and argv[x] not in VALUE_SWITCHES]
+if argv[0] not in ("version", "config", "listremotes"):
+    delay = config["latency"]
+    files = [paths[0]] if argv[0] in ("moveto", "deletefile") else []
+    if "--files-from-raw" in argv:
+        with open(argv[argv.index("--files-from-raw") + 1], encoding="utf8") as f:
+            files = [os.path.join(paths[0], key) for key in f.read().splitlines()]
+    delay += config["file_latency"] * len(files)
+    if argv[0] in ("copy", "sync") and config["bandwidth"]:
+        delay += sum(os.path.getsize(file) for file in files if os.path.isfile(file)) / config["bandwidth"]
+    time.sleep(delay)
+os.execv(config["rclone"], [config["rclone"]] + argv)
+"""
+
+def latency_rclone(tmpdir, rclone, latency, file_latency, bandwidth):
+    """Write the latency injecting wrapper of the real rclone to tmpdir.  Returns (wrapper, env, log)."""
+    wrapper = os.path.join(tmpdir, "rclone")
+    log = os.path.join(tmpdir, "rclone_commands")
+    config = os.path.join(tmpdir, "rclone_wrapper.json")
+    with open(wrapper, 'w') as f:
+        f.write(LATENCY_RCLONE.format(python=sys.executable))
+    os.chmod(wrapper, 0o755)
+    with open(config, 'w') as f:
+        json.dump({"rclone": shutil.which(rclone) or rclone, "log": log, "latency": latency,
+                   "file_latency": file_latency, "bandwidth": bandwidth}, f)
+    return wrapper, dict(os.environ, RCLONESYNC_BENCH_WRAPPER=config), log
+
+
+def make_tree(root, entries, seed=1):
+    """Write a tree of entries small files under root, in directories of about 100 files, with mtimes spread over years."""
+    rnd = random.Random(seed)
+    base = time.mktime((2015, 1, 1, 0, 0, 0, 0, 0, -1))
+    for x in range(entries):
+        file = os.path.join(root, "dir{:03}".format(x // 100), "file {:07}.dat".format(x))
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, 'wb') as f:
+            f.write(rnd.randbytes(rnd.randrange(4096)))
+        epoch = base + rnd.randrange(6 * 365 * 86400)
+        os.utime(file, (epoch, epoch))
+
+
+def tree_files(root):
+    """Return {relative path: size} for the files under root."""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            file = os.path.join(dirpath, name)
+            files[os.path.relpath(file, root)] = os.path.getsize(file)
+    return files
+
+
+def scenario_mass_rename(path1, path2, rnd):
+    """Rename the first directory on Path1."""
+    os.rename(os.path.join(path1, "dir000"), os.path.join(path1, "dir000_renamed"))
+
+def scenario_conflict_storm(path1, path2, rnd):
+    """Change 5% of the files on both paths, differently."""
+    for rel in sorted(tree_files(path1)):
+        if rnd.random() < 0.05 and os.path.exists(os.path.join(path2, rel)):
+            for path, text in ((path1, b"Path1 change"), (path2, b"Path2 change")):
+                with open(os.path.join(path, rel), 'ab') as f:
+                    f.write(text)
+
+def scenario_dst_shift(path1, path2, rnd):
+    """Shift the mtime of every Path1 file by an hour, as a DST change on a FAT drive would."""
+    for rel in tree_files(path1):
+        stat = os.stat(os.path.join(path1, rel))
+        os.utime(os.path.join(path1, rel), (stat.st_atime + 3600, stat.st_mtime + 3600))
+
+E2E_SCENARIOS = (                                   # name, change applied before the pass, extra switches for the pass
+    ("first_sync", None, ["--first-sync"]),
+    ("noop", None, []),
+    ("mass_rename", scenario_mass_rename, []),
+    ("conflict_storm", scenario_conflict_storm, []),
+    ("dst_shift", scenario_dst_shift, []),          # Expected to SAFETY ABORT, with exit code 1
+)
+
+def bench_e2e(entries, rclone, latency, file_latency, bandwidth, extra_args, json_file, baseline_file):
+    """
+    Run the E2E_SCENARIOS in order, each a real rclonesync.py pass between two local trees of about entries files,
+    with rclone thru the latency injecting wrapper, as if one path were a cloud service.  Reports each pass's time,
+    peak RSS, exit code, rclone commands, and if the trees were left the same.  The results are written to json_file,
+    and compared to the results in baseline_file, if given.
+    """
+    results = {"settings": {"entries": entries, "latency": latency, "file_latency": file_latency,
+                            "bandwidth": bandwidth, "rclonesync_args": extra_args},
+               "scenarios": {}}
+    baseline = None
+    if baseline_file is not None:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+    rnd = random.Random(1)
+    MB = 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path1 = os.path.join(tmpdir, "path1")
+        path2 = os.path.join(tmpdir, "path2")
+        make_tree(path1, entries, seed=1)
+        make_tree(path2, entries // 10, seed=2)     # Some of the same names, some different contents
+        workdir = os.path.join(tmpdir, "workdir")
+        os.mkdir(workdir)
+        config = os.path.join(tmpdir, "rclone.conf")
+        open(config, 'w').close()
+        wrapper, env, log = latency_rclone(tmpdir, rclone, latency, file_latency, bandwidth)
+        common = [path1, path2, "--workdir", workdir, "--config", config, "--rclone", wrapper]
+
+        print(f"e2e  {entries} files, {latency} sec per call, {file_latency} sec per file, {bandwidth/MB:.1f} MB/sec:")
+        for name, change, switches in E2E_SCENARIOS:
+            if change is not None:
+                change(path1, path2, rnd)
+            if os.path.exists(log):
+                os.remove(log)
+            status, seconds, peak, error = run_rclonesync(common + switches + extra_args, env)
+            with open(log, encoding='utf8') as f:
+                commands = collections.Counter(json.loads(line)[0] for line in f)
+            in_sync = tree_files(path1) == tree_files(path2)
+            results["scenarios"][name] = {"seconds": round(seconds, 3), "peak_rss": peak, "exit": status,
+                                          "commands": dict(sorted(commands.items())), "in_sync": in_sync}
+            compared = ""
+            if baseline is not None and name in baseline["scenarios"]:
+                compared = f"  ({seconds / baseline['scenarios'][name]['seconds']:.2f}x baseline)"
+            print(f"  {name:15} {seconds:8.3f} sec{compared}  {peak/MB:6.1f} MB peak RSS  exit {status}  "
+                  + ("in sync" if in_sync else "OUT OF SYNC") + "  rclone commands:  "
+                  + ", ".join(f"{cmd} {count}" for cmd, count in sorted(commands.items())))
+            if status == 2:
+                print(error, end='')
+                break
+
+    if json_file is not None:
+        with open(json_file, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to <{json_file}>")
+    return 0
+
+
+def synth_tree(root, entries, seed=1):
+    """
+    Write a tree of entries small files under root, with sub-second modtimes spread over years, plus a symlink
+    and an excluded directory, as a local lister must skip them.  Returns the path of an exclude filters file.
+    """
+    rnd = random.Random(seed)
+    dirs = ["dir{:03}/sub{:02}".format(d, rnd.randrange(10)) for d in range(max(1, entries // 100))] + [""]
+    base = time.mktime((2015, 1, 1, 0, 0, 0, 0, 0, -1))
+    for x in range(entries):
+        file = os.path.join(root, rnd.choice(dirs), "file {:07}.dat".format(x))
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, 'wb') as f:
+            f.write(b'x' * rnd.randrange(100))
+        epoch_ns = int((base + rnd.randrange(6 * 365 * 86400)) * 10**9) + rnd.randrange(10**9)
+        os.utime(file, ns=(epoch_ns, epoch_ns))
+    os.makedirs(os.path.join(root, "skipped"), exist_ok=True)
+    with open(os.path.join(root, "skipped", "excluded.dat"), 'w') as f:
+        f.write("excluded")
+    with open(os.path.join(root, "excluded.tmp"), 'w') as f:
+        f.write("excluded")
+    os.symlink(os.path.join(root, "excluded.tmp"), os.path.join(root, "link.dat"))
+    filters = os.path.join(root, "..", "filters")
+    with open(filters, 'w') as f:
+        f.write("# Bench filters\n- skipped/\n- *.tmp\n")
+    return filters
+
+
+def bench_local(entries, repeat, rclone):
+    """Compare the --native-local lister versus rclone lsl of a local tree, for identical lsl lines and Listing."""
+    rclonesync.args = argparse.Namespace(workers=4)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = os.path.join(tmpdir, "tree") + "/"
+        filters = synth_tree(root, entries)
+        lslfile = os.path.join(tmpdir, "LSL_bench")
+
+        rclone_best = native_best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with open(lslfile, 'wb') as of:
+                subprocess.run([rclone, "lsl", root, "--filter-from", filters], stdout=of, stderr=subprocess.DEVNULL, check=True)
+            _, reference = rclonesync.load_list(lslfile)
+            rclone_time = time.perf_counter() - start
+            with open(lslfile, encoding='utf8') as f:
+                rclone_lines = sorted(f)
+            native_time, (_, native) = timed(rclonesync.local_lsl, root, lslfile, filters)
+            with open(lslfile, encoding='utf8') as f:
+                native_lines = sorted(f)
+            rclone_best = rclone_time if rclone_best is None else min(rclone_best, rclone_time)
+            native_best = native_time if native_best is None else min(native_best, native_time)
+
+        if rclone_lines != native_lines or list(reference.items()) != list(native.items()):
+            print("ERROR  Native local listing differs from rclone lsl")
+            for line in sorted(set(rclone_lines) ^ set(native_lines))[:10]:
+                print("  " + ("rclone  " if line in rclone_lines else "native  ") + line, end='')
+            return 1
+        print(f"local  {entries} files, best of {repeat}:")
+        print(f"  rclone lsl + load_list  {rclone_best:8.3f} sec")
+        print(f"  native                  {native_best:8.3f} sec  ({rclone_best/native_best:.1f}x)")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="***** rclonesync micro-benchmarks *****")
+    parser.add_argument('benchmark', choices=['load_list', 'listing', 'snapshot', 'deltas', 'lsjson', 'local', 'scale', 'e2e'],
+                        help="Benchmark to run.")
+    parser.add_argument('-n', '--entries', type=int, default=200000,
+                        help="Number of synthetic lsl entries (default 200000).")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Number of timed runs, the best is reported (default 3).")
+    parser.add_argument('--sizes', default="10000,100000,1000000",
+                        help="Comma separated numbers of entries for the scale benchmark (default 10000,100000,1000000).  Try 10000000 too.")
+    parser.add_argument('--rates', type=parse_rates, default=CHANGE_RATES,
+                        help="Change rates for the scale benchmark, as fractions of the entries, eg new=0.01,newer=0.01,older=0.001,deleted=0.01,conflicts=0.001 (the default).")
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help="For the e2e benchmark, seconds added to each rclone call (default 0.2).")
+    parser.add_argument('--file-latency', type=float, default=0.02,
+                        help="For the e2e benchmark, seconds added per file copied, deleted or moved (default 0.02).")
+    parser.add_argument('--bandwidth', type=float, default=10*1024*1024,
+                        help="For the e2e benchmark, bytes/sec copied, or 0 for no limit (default 10 MB/sec).")
+    parser.add_argument('--json', default=None,
+                        help="For the e2e benchmark, file to write the results to, as a baseline for later runs.")
+    parser.add_argument('--baseline', default=None,
+                        help="For the e2e benchmark, results file of an earlier run to compare with.")
+    parser.add_argument('--rclonesync-args', nargs=argparse.REMAINDER, default=[],
+                        help="Switches for the rclonesync runs of the scale and e2e benchmarks, eg --native-local.  Specify at the end of the command line.")
+    parser.add_argument('--rclone', default="rclone",
+                        help="Path to rclone executable, for the local and e2e benchmarks (default is rclone in path environment var).")
+    args = parser.parse_args()
+    logging.basicConfig(format='%(message)s')
+
+    if args.benchmark == 'load_list':
+        sys.exit(bench_load_list(args.entries, args.repeat))
+    if args.benchmark == 'listing':
+        sys.exit(bench_listing(args.entries))
+    if args.benchmark == 'snapshot':
+        sys.exit(bench_snapshot(args.entries))
+    if args.benchmark == 'deltas':
+        sys.exit(bench_deltas(args.entries, args.repeat))
+    if args.benchmark == 'lsjson':
+        sys.exit(bench_lsjson(args.entries, args.repeat))
+    if args.benchmark == 'scale':
+        sys.exit(bench_scale([int(size) for size in args.sizes.split(',')], args.rates, args.rclonesync_args))
+    if args.benchmark == 'e2e':
+        sys.exit(bench_e2e(args.entries, args.rclone, args.latency, args.file_latency, args.bandwidth,
+                           args.rclonesync_args, args.json, args.baseline))
+    if args.benchmark == 'local':
+        sys.exit(bench_local(args.entries, args.repeat, args.rclone))